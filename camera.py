@@ -1,61 +1,63 @@
 import asyncio
+import binascii
+import re
 import aiohttp
 
-async def capture_image_data(logger,camera_id,endpoint):
+_JPEG_DATA_URI = re.compile(rb'data:image/jpeg;base64,([A-Za-z0-9+/=]+)')
+
+async def capture_image_data(logger,camera_id,endpoint,session=None):
+    """Trigger a new picture, wait for it and return (camera_id, jpeg bytes). Reuses session if one is passed."""
     try:
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{endpoint}/take/picture") as response:
-                if response.status == 200:
-                    logger.info(f"Successfully requested new image for : {camera_id}")
-                    await asyncio.sleep(120)
-                else:
-                    # no picture, no camera.
-                    return
-
-            logger.info(f"Getting image for {camera_id}")
-            
-            image_bytes = await get_camera_bytes(endpoint)
-            
-            if isinstance(image_bytes, bytes):
-                logger.info(f"Successfully received image from: {camera_id}")
-                import base64
-                base64_data = base64.b64encode(image_bytes).decode('utf-8')
-                return camera_id,base64_data
-
-        logger.info("Done.")
-        return None
+        if session is None:
+            async with aiohttp.ClientSession() as session:
+                return await _capture_image_data(logger, camera_id, endpoint, session)
+        return await _capture_image_data(logger, camera_id, endpoint, session)
     
     except Exception as e:
         logger.error(f"Error logging camera {camera_id}: {str(e)}")
         return
 
-async def get_camera_bytes(endpoint):
+async def _capture_image_data(logger, camera_id, endpoint, session):
+    async with session.get(f"{endpoint}/take/picture") as response:
+        if response.status != 200:
+            # no picture, no camera.
+            return
+    # Release the connection back to the pool while the camera takes the picture
+    logger.info(f"Successfully requested new image for : {camera_id}")
+    await asyncio.sleep(120)
+
+    logger.info(f"Getting image for {camera_id}")
+    
+    image_bytes = await get_camera_bytes(endpoint, session)
+    
+    if isinstance(image_bytes, bytes):
+        logger.info(f"Successfully received image from: {camera_id}")
+        # Raw JPEG bytes, stored as a BLOB
+        return camera_id,image_bytes
+
+    logger.info("Done.")
+    return None
+
+async def get_camera_bytes(endpoint, session=None):
+        """Fetch the camera page and decode its embedded JPEG. Reuses session if one is passed."""
         try:
             timeout = aiohttp.ClientTimeout(total=60)
-            async with aiohttp.ClientSession(timeout=timeout) as session:
-                async with session.get(endpoint) as response:
-                    content = await response.text()
-                    from bs4 import BeautifulSoup
-                    soup = BeautifulSoup(content, 'html.parser')
-                    
-                    # Find first image in body
-                    img = soup.body.find('img')
-                    if img and img.get('src'):
-                        # Get base64 data directly from src attribute
-                        img_data = img['src']
-                        
-                        # Check if it's a base64 encoded image
-                        if img_data.startswith('data:image/jpeg;base64,'):
-                            # Extract just the base64 content
-                            base64_data = img_data.split(',')[1]
-                            
-                            # Decode base64 to bytes
-                            import base64
-                            image_bytes = base64.b64decode(base64_data)
-                            
-                            return image_bytes
-
-            return "No image found in response", 500
+            if session is None:
+                async with aiohttp.ClientSession(timeout=timeout) as session:
+                    return await _read_camera_bytes(session, endpoint, timeout)
+            return await _read_camera_bytes(session, endpoint, timeout)
             
         except Exception:
             return "Error getting the image", 500
+
+async def _read_camera_bytes(session, endpoint, timeout):
+        async with session.get(endpoint, timeout=timeout) as response:
+            content = await response.read()
+
+        # The camera page embeds the picture as <img src="data:image/jpeg;base64,...">
+        match = _JPEG_DATA_URI.search(content)
+        if match:
+            # Decode straight out of the page buffer instead of copying the base64 text out first
+            return binascii.a2b_base64(memoryview(content)[match.start(1):match.end(1)])
+
+        return "No image found in response", 500
@@ -1,4 +1,5 @@
 import asyncio
+from collections.abc import Mapping
 from state import SystemState
 from db import DatabaseAdapter
 # import statistics # No longer needed
@@ -26,6 +27,7 @@ class Controller:
             led_controller = current_state.zeus[id]
 
             current_state.light_states[id] = brightness
+            current_state.page_version += 1
             led_controller.set_level(brightness)
 
             self._log_status_fire_and_forget(current_state)
@@ -46,6 +48,7 @@ class Controller:
             else:
                 light_controller.turn_on()
                 current_state.static_light_states[id] = True
+            current_state.page_version += 1
 
             self._logger.info(f"Toggling static light #{id} to {current_state.static_light_states[id]}")
             # Trigger status update
@@ -96,6 +99,7 @@ class Controller:
                 }
                 self._logger.info(f"Disabled auto mode for static light #{id}")
                 
+            current_state.page_version += 1
             self._log_status_fire_and_forget(current_state)
             
         # Check if this is a Zeus light
@@ -129,6 +133,7 @@ class Controller:
                 }
                 self._logger.info(f"Disabled auto mode for Zeus light #{id}")
                 
+            current_state.page_version += 1
             self._log_status_fire_and_forget(current_state)
             
         return current_state
@@ -277,6 +282,19 @@ class Controller:
         """
         return self.check_sensor_watering(current_state)
 
+    def calculate_total_watering_duration(self, current_state: SystemState) -> int:
+        """
+        Calculates the wait time of the schedule built from the configured durations.
+        Matches create_custom_schedule: one second of pump priming, then each valve in turn.
+        
+        Args:
+            current_state: The current system state
+            
+        Returns:
+            Total duration in seconds
+        """
+        return 1 + sum(current_state.watering_durations.values())
+
     async def execute_watering_sequence(self, current_state, progress_callback=None, schedule=None):
         """
         Execute the watering sequence with progress tracking through callback.
@@ -298,15 +316,14 @@ class Controller:
             self._status_update_callback()
 
         # Calculate total wait time for progress tracking
-        total_wait_time = sum(step for step in schedule if not isinstance(step, dict))
+        total_wait_time = sum(step for step in schedule if not isinstance(step, Mapping))
         elapsed_wait_time = 0
         
         # Track active zone
         current_zone = None
 
         # Setting initial state
-        for id in range(1, current_state.wtrctrl.num_valves + 1):
-            current_state.wtrctrl.set_valve(id, False)
+        current_state.wtrctrl.set_all_valves(False)
         await asyncio.sleep(1)
         
         try:
@@ -315,7 +332,7 @@ class Controller:
                 await progress_callback(0, None, "in_progress")
             
             for step in schedule:
-                if isinstance(step, dict):
+                if isinstance(step, Mapping):
                     # This is a control step (valve/pump operation)
                     for device, (id, state) in step.items():
                         if 'valve' in device:
@@ -337,12 +354,9 @@ class Controller:
                                         "zone_completed"
                                     )
                                 current_zone = None
-                                
-                            self._logger.info(f"Setting actor [{device}] to [{state}]")
-                            current_state.valve_states[id] = current_state.wtrctrl.set_valve(id, state)
-                        elif device == 'pump':
-                            current_state.pump_states[1] = current_state.wtrctrl.set_pump(state)
-                            self._logger.info(f"Setting actor [{device}] to [{state}]")
+
+                    # Write all pumps/valves of this step in one GPIO transaction
+                    current_state.wtrctrl.apply_step(step)
                 else:
                     # This is a wait step
                     self._logger.info(f"Waiting for {step}s. Progress: {elapsed_wait_time}/{total_wait_time}")
@@ -391,7 +405,6 @@ class Controller:
             raise
 
         finally:
-            for id in range(1, current_state.wtrctrl.num_valves + 1):
-                current_state.wtrctrl.set_valve(id, False)
+            current_state.wtrctrl.set_all_valves(False)
             current_state.wtrctrl.set_pump(False)
-            current_state.wtrctrl.logger[0].info("All valves and pump turned off")
+            current_state.wtrctrl.logger.info("All valves and pump turned off")
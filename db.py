@@ -1,4 +1,7 @@
 import asyncio 
+import binascii
+import json
+import zlib
 from datetime import datetime
 import aiosqlite
 
@@ -7,6 +10,10 @@ from state import SystemState
 
 class DatabaseAdapter:
     """Database adapter for async SQLite operations"""
+
+    CAMERA_MAX_FAILURES = 3 # consecutive failed captures before a camera is skipped
+    CAMERA_PROBE_INTERVAL = 10 # log_status cycles between captures of a skipped camera
+    SCHEMA_VERSION = 1 # PRAGMA user_version; 1: camera_images.image_data holds raw JPEG bytes, not base64 text
     
     def __init__(self, logger, config):
         self.logger = logger
@@ -14,6 +21,9 @@ class DatabaseAdapter:
         self.conn_string = config['database_connection']
         self.timeout = config['database_timeout']
         self._connection = None
+        self._last_image_crc = {} # {camera_id: crc32 of the last stored image}
+        self._camera_failures = {} # {camera_id: consecutive failed captures}
+        self._camera_skipped = {} # {camera_id: cycles skipped since the last probe}
 
     async def init_tables(self):
         """Initialize database tables if they don't exist"""
@@ -36,11 +46,59 @@ class DatabaseAdapter:
                 CREATE TABLE IF NOT EXISTS camera_images (
                     camera_id INTEGER,
                     timestamp TEXT NOT NULL,
-                    image_data TEXT
+                    image_data BLOB
                 )
             ''')
+
+            await cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_camera_images_camera_timestamp
+                ON camera_images (camera_id, timestamp)
+            ''')
+
+            # Last time each camera delivered a picture, also when it was not stored
+            await cursor.execute('''
+                CREATE TABLE IF NOT EXISTS camera_status (
+                    camera_id INTEGER PRIMARY KEY,
+                    last_seen TEXT NOT NULL
+                )
+            ''')
+
+            await cursor.execute('PRAGMA user_version')
+            (version,) = await cursor.fetchone()
+            if version < 1:
+                await self._decode_base64_images(cursor)
+            if version < self.SCHEMA_VERSION:
+                await cursor.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
             await self._connection.commit()
 
+    async def _decode_base64_images(self, cursor, batch_size: int = 50):
+        """Convert camera images stored as base64 text by older versions to raw JPEG BLOBs"""
+        converted = 0
+        invalid = 0
+        last_rowid = 0
+        while True:
+            await cursor.execute('''
+                SELECT rowid, image_data FROM camera_images
+                WHERE typeof(image_data) = 'text' AND rowid > ?
+                ORDER BY rowid LIMIT ?
+            ''', (last_rowid, batch_size))
+            rows = await cursor.fetchall()
+            if not rows:
+                break
+            last_rowid = rows[-1][0]
+
+            updates = []
+            for rowid, image_data in rows:
+                try:
+                    updates.append((binascii.a2b_base64(image_data), rowid))
+                except (binascii.Error, ValueError):
+                    invalid += 1
+            await cursor.executemany('UPDATE camera_images SET image_data = ? WHERE rowid = ?', updates)
+            converted += len(updates)
+
+        if converted or invalid:
+            self.logger.info(f"Converted {converted} base64 camera images to BLOBs, {invalid} could not be decoded")
+
     async def _get_connection(self):
         """Get database connection with proper configuration"""
         if not self._connection:
@@ -55,65 +113,139 @@ class DatabaseAdapter:
                     timeout=self.timeout
                 )
             await self._connection.execute('PRAGMA journal_mode=WAL')
+            # WAL only needs fsync at checkpoints with NORMAL, which spares the SD card
+            await self._connection.execute('PRAGMA synchronous=NORMAL')
+            await self._connection.execute('PRAGMA temp_store=MEMORY')
+            await self._connection.execute('PRAGMA cache_size=-8000')
         return self._connection
 
+    async def _recover(self):
+        """Roll back a failed write; drop the connection if that fails so the next call reconnects"""
+        try:
+            await self._connection.rollback()
+        except Exception as e:
+            self.logger.error(f"Rollback failed, reconnecting on next write: {e}")
+            try:
+                await self._connection.close()
+            except Exception:
+                pass
+            self._connection = None
+
     async def close(self):
         """Close database connection if open"""
         if self._connection:
             await self._connection.close()
             self._connection = None
 
-    async def log_status(self, current: SystemState):
-        """Log full system state including camera images"""
+    def _should_capture(self, camera_id: int) -> bool:
+        """Skip cameras that keep failing, except for a probe every CAMERA_PROBE_INTERVAL cycles"""
+        if self._camera_failures.get(camera_id, 0) < self.CAMERA_MAX_FAILURES:
+            return True
+        skipped = self._camera_skipped.get(camera_id, 0) + 1
+        if skipped >= self.CAMERA_PROBE_INTERVAL:
+            self._camera_skipped[camera_id] = 0
+            return True
+        self._camera_skipped[camera_id] = skipped
+        return False
+
+    def _record_capture(self, camera_id: int, success: bool):
+        """Track consecutive capture failures, logging only when a camera is skipped or comes back"""
+        failures = self._camera_failures.get(camera_id, 0)
+        if success:
+            if failures >= self.CAMERA_MAX_FAILURES:
+                self.logger.info(f"Camera {camera_id} is responding again, resuming captures")
+            self._camera_failures[camera_id] = 0
+            return
+        failures += 1
+        self._camera_failures[camera_id] = failures
+        if failures == self.CAMERA_MAX_FAILURES:
+            self.logger.warning(f"Camera {camera_id} failed {failures} captures in a row, "
+                                f"retrying it every {self.CAMERA_PROBE_INTERVAL} cycles")
+
+    @staticmethod
+    def _status_row(current: SystemState, timestamp: str) -> dict:
+        """Status table row, with the state dicts stored as compact JSON (readable with json_extract)"""
+        return {
+            'timestamp': timestamp,
+            'valve_states': json.dumps(current.valve_states, separators=(',', ':')),
+            'light_states': json.dumps(current.light_states, separators=(',', ':')),
+            'pump_states': json.dumps(current.pump_states, separators=(',', ':')),
+            'static_light_states': json.dumps(current.static_light_states, separators=(',', ':'))
+        }
+
+    async def log_status(self, current: SystemState, session=None):
+        """Log full system state including camera images, fetched over session if given"""
         try:
+            now = datetime.now().isoformat()
+            status_row = self._status_row(current, now)
+
+            # Capture images concurrently, before opening the write transaction
+            camera_ids = [
+                camera_id for camera_id in range(len(current.camera_endpoints))
+                if self._should_capture(camera_id)
+            ]
+            image_tasks = [
+                asyncio.create_task(
+                    capture_image_data(
+                        self.logger,
+                        camera_id, 
+                        current.camera_endpoints[camera_id],
+                        session
+                    )
+                )
+                for camera_id in camera_ids
+            ]
+            
+            images = await asyncio.gather(*image_tasks)
+            for camera_id, data in zip(camera_ids, images):
+                self._record_capture(camera_id, data is not None)
+            if images and not isinstance(images, (list, tuple)):
+                images = [images]
+
+            self.logger.info(f"Captured {len(images) if images else 0} images")
+
+            image_rows = []
+            seen_rows = []
+            image_crcs = {}
+            for data in images:
+                if data is None:
+                    continue
+                if isinstance(data, tuple):
+                    camera_id, image_data = data  # Unpack single tuple
+                    seen_rows.append((camera_id, now))
+                    # Skip frames identical to the last stored one (e.g. the camera served its previous picture)
+                    crc = zlib.crc32(image_data)
+                    if self._last_image_crc.get(camera_id) == crc:
+                        self.logger.info(f"Image for camera {camera_id} unchanged, not storing")
+                        continue
+                    image_crcs[camera_id] = crc
+                    self.logger.info(f"Storing image for camera {camera_id}")
+                    image_rows.append((camera_id, now, image_data))
+
+            # Status row and images in a single transaction
             conn = await self._get_connection()
             async with conn.cursor() as cursor:
-                now = datetime.now().isoformat()
-                
-                # Insert system state
                 await cursor.execute('''
                     INSERT INTO status VALUES (:timestamp, :valve_states, 
                     :light_states, :pump_states, :static_light_states)
-                ''', {
-                    'timestamp': now,
-                    'valve_states': str(current.valve_states),
-                    'light_states': str(current.light_states),
-                    'pump_states': str(current.pump_states), 
-                    'static_light_states': str(current.static_light_states)
-                })
-
-                # Capture images concurrently
-                image_tasks = [
-                    asyncio.create_task(
-                        capture_image_data(
-                            self.logger,
-                            camera_id, 
-                            current.camera_endpoints[camera_id]
-                        )
-                    )
-                    for camera_id in range(len(current.camera_endpoints))
-                ]
-                
-                images = await asyncio.gather(*image_tasks)
-                if images and not isinstance(images, (list, tuple)):
-                    images = [images]
-
-                self.logger.info(f"Captured {len(images) if images else 0} images")
-
-                for data in images:
-                    if data is None:
-                        continue
-                    if isinstance(data, tuple):
-                        camera_id, image_data = data  # Unpack single tuple
-                        self.logger.info(f"Storing image for camera {camera_id}")
-                        await cursor.execute('''
-                            INSERT INTO camera_images VALUES (?, ?, ?)
-                        ''', (camera_id, now, image_data))
+                ''', status_row)
+                if image_rows:
+                    await cursor.executemany('''
+                        INSERT INTO camera_images VALUES (?, ?, ?)
+                    ''', image_rows)
+                if seen_rows:
+                    await cursor.executemany('''
+                        INSERT INTO camera_status VALUES (?, ?)
+                        ON CONFLICT(camera_id) DO UPDATE SET last_seen = excluded.last_seen
+                    ''', seen_rows)
                 await conn.commit()
+                self._last_image_crc.update(image_crcs)
                 self.logger.debug('Status and images logged successfully')
 
         except aiosqlite.Error as e:
             self.logger.error(f"Database error in log_status: {e}")
+            if self._connection:
+                await self._recover()
         except Exception as e:
             self.logger.error(f"Unexpected error in log_status: {e}")
 
@@ -127,18 +259,14 @@ class DatabaseAdapter:
                 await cursor.execute('''
                     INSERT INTO status VALUES (:timestamp, :valve_states,
                     :light_states, :pump_states, :static_light_states)
-                ''', {
-                    'timestamp': now,
-                    'valve_states': str(current.valve_states),
-                    'light_states': str(current.light_states),
-                    'pump_states': str(current.pump_states),
-                    'static_light_states': str(current.static_light_states)
-                })
+                ''', self._status_row(current, now))
 
                 await conn.commit()
                 self.logger.debug('Status logged successfully')
 
         except aiosqlite.Error as e:
             self.logger.error(f"Database error in log_status_without_images: {e}")
+            if self._connection:
+                await self._recover()
         except Exception as e:
             self.logger.error(f"Unexpected error in log_status_without_images: {e}")
@@ -57,9 +57,9 @@ class FanControl(gpio_device):
         if not self.debug:
             try:
                 GPIO.setmode(GPIO.BCM)
-                GPIO.setup(self.gpio_pin, GPIO.OUT)
-                # Initialize fan to OFF state (assuming HIGH is OFF)
-                GPIO.output(self.gpio_pin, GPIO.HIGH)
+                # Initialize fan to OFF state (assuming HIGH is OFF) as part of the setup,
+                # so the pin never drives LOW (ON) in between
+                GPIO.setup(self.gpio_pin, GPIO.OUT, initial=GPIO.HIGH)
                 self.logger.info(f"GPIO pin {self.gpio_pin} setup as OUTPUT, initial state HIGH (OFF).")
             except Exception as e:
                 self.logger.error(f"Error setting up GPIO pin {self.gpio_pin}: {e}. Switching to debug mode.")
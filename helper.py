@@ -3,10 +3,12 @@ import asyncio
 from aiohttp import web
 import aiohttp_jinja2
 import importlib.util
+from functools import lru_cache
 
+@lru_cache(maxsize=1)
 def is_raspberry_pi():
     """
-    Checks if the RPi.GPIO library is installed.
+    Checks if the RPi.GPIO library is installed. The lookup is done once per process.
 
     Returns:
         bool: True if RPi.GPIO is installed, False otherwise.
@@ -17,18 +19,7 @@ def render(request, context):
     """Render the main template with the given context."""
     # If context is a SystemState object, convert it to a dictionary
     if hasattr(context, '__class__') and context.__class__.__name__ == 'SystemState':
-        # Create a dictionary with all the attributes we need for the template
-        template_context = {
-            'lights': context.light_states,
-            'static_lights': context.static_light_states,
-            'static_light_auto_states': context.static_light_auto_states,
-            'zeus_auto_states': context.zeus_auto_states,
-            'watering_durations': context.watering_durations,
-            'sensor_configs': context.sensor_configs,
-            'sensor_readings': context.sensor_readings,
-            'camera_count': len(context.camera_endpoints) if hasattr(context, 'camera_endpoints') else 0,
-            'fan_state': context.fan_state if hasattr(context, 'fan_state') else {}
-        }
+        template_context = context.template_context()
         return aiohttp_jinja2.render_template('index.html', request, template_context)
     else:
         # If it's already a dictionary, use it directly
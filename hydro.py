@@ -1,8 +1,10 @@
 from gpio_device import gpio_device
-import time
-import threading
+import asyncio
+import math
+from array import array
 from datetime import datetime
 from collections import defaultdict # Use defaultdict for easier state tracking
+from types import MappingProxyType
 
 # Removed schedule import
 
@@ -11,11 +13,17 @@ class Hydro(gpio_device):
     # Removed DEFAULT_SCHEDULE
 
     def __init__(self, logger, gpio_config, state, debug=False): # Added state parameter
+        if state is None:
+            raise ValueError("Hydro requires a SystemState instance")
         self.gpio_config = gpio_config
         self.state = state # Store state object
         self.debug = debug
-        self.logger = logger,
+        self.logger = logger
         self.num_valves = len(gpio_config["valve_pins"])
+        # Valve pins ordered by valve number, for batched GPIO writes
+        self._valve_pin_list = [gpio_config["valve_pins"][str(valve)] for valve in range(1, self.num_valves + 1)]
+        # Schedule builder unrolled for this valve count (see _compile_schedule_builder)
+        self._make_schedule = self._compile_schedule_builder(self.num_valves)
         # Removed time-based auto mode attributes
         # self._auto_mode = False
         # self._start_time = None
@@ -23,37 +31,48 @@ class Hydro(gpio_device):
         # self._scheduler_thread = None
         # self._scheduler_running = False
 
-        # New state tracking for sensor-based watering
-        self._watering_active = defaultdict(bool) # {stage: True if watering is active}
-        self._waiting_for_readings = defaultdict(bool) # {stage: True if in cooldown waiting for readings}
-        self._readings_since_watered = defaultdict(int) # {stage: count of readings since last watering}
-        self._last_reading_timestamp = defaultdict(lambda: None) # {sensor_id: last processed timestamp}
+        # New state tracking for sensor-based watering, indexed by stage (1..num_valves, slot 0 unused)
+        self._watering_active = [False] * (self.num_valves + 1) # True if watering is active
+        self._waiting_for_readings = [False] * (self.num_valves + 1) # True if in cooldown waiting for readings
+        self._readings_since_watered = [0] * (self.num_valves + 1) # count of readings since last watering
+        self._pump_refcount = 0 # number of stage watering tasks currently using the pump
+        self._sensor_idx = {} # {sensor_id: slot in _last_seq}, assigned in _get_stage_index
+        self._last_seq = array('q') # seq of the last reading counted for cooldown, per sensor slot
+        self._watering_tasks = {} # {stage: future of the running _execute_stage_watering}
+        self._loop = None # Event loop stage watering runs on, see set_event_loop
+        self._stage_index = {} # {stage: [active sensor_ids]}, see _get_stage_index
+        self._stage_index_version = None # state.config_version the index was built from
 
         logger.info("Hydro Logger is initialized")
 
+        self._GPIO = None # RPi.GPIO module, bound once when running on hardware
         if not debug:
             import RPi.GPIO as GPIO
+            self._GPIO = GPIO
             GPIO.setmode(GPIO.BCM)
+            # Output level indexed by the requested state (active-low: False -> HIGH, True -> LOW)
+            self._levels = (GPIO.HIGH, GPIO.LOW)
             
-            # Setup pump pin
-            GPIO.setup(gpio_config["pump_pin"], GPIO.OUT)
-            GPIO.output(gpio_config["pump_pin"], GPIO.HIGH)
+            # Setup pump and valve pins, all off (HIGH)
+            GPIO.setup([gpio_config["pump_pin"]] + self._valve_pin_list, GPIO.OUT, initial=GPIO.HIGH)
 
-            # Setup valve pins
-            for pin in gpio_config["valve_pins"].values():
-                GPIO.setup(pin, GPIO.OUT)
-                GPIO.output(pin, GPIO.HIGH)
+    def set_event_loop(self, loop: asyncio.AbstractEventLoop):
+        """Sets the event loop that sensor-triggered watering tasks are scheduled on."""
+        self._loop = loop
 
     def close_all_valves(self):
         """Closes all valves and stops the pump."""
-        self.logger[0].info("Closing all valves and stopping pump.")
-        for valve in range(1, self.num_valves + 1):
-            self.set_valve(valve, False)
+        self.logger.info("Closing all valves and stopping pump.")
+        # Cancel running stage watering; the valves are closed below
+        for stage, task in list(self._watering_tasks.items()):
+            self.logger.info(f"Cancelling watering task for stage {stage}.")
+            task.cancel()
+        self.set_all_valves(False)
         self.set_pump(False)
         # Reset watering active flags if any were stuck
-        for stage in list(self._watering_active.keys()):
-             if self._watering_active[stage]:
-                 self.logger[0].warning(f"Forcefully resetting active watering flag for stage {stage} during close_all_valves.")
+        for stage, active in enumerate(self._watering_active):
+             if active:
+                 self.logger.warning(f"Forcefully resetting active watering flag for stage {stage} during close_all_valves.")
                  self._watering_active[stage] = False
 
 
@@ -66,25 +85,55 @@ class Hydro(gpio_device):
             return state
 
         pin = self.gpio_config["valve_pins"][str(valve_num)]
-        import RPi.GPIO as GPIO
-        GPIO.output(pin, GPIO.LOW if state else GPIO.HIGH)
+        self._GPIO.output(pin, self._levels[state])
         # Update state tracking in SystemState
-        if hasattr(self, 'state') and self.state:
-             self.state.valve_states[valve_num] = state
-        self.logger[0].info(f"Setting valve {valve_num} to {state}")
+        self.state.valve_states[valve_num] = state
+        self.logger.info(f"Setting valve {valve_num} to {state}")
         return state
 
+    def set_all_valves(self, state: bool):
+        """Set all valves to the same state (on/off) with a single GPIO write"""
+        for valve_num in range(1, self.num_valves + 1):
+            self.state.valve_states[valve_num] = state
+        self.logger.info(f"Setting all valves to {state}")
+        if self.debug:
+            return state
+
+        self._GPIO.output(self._valve_pin_list, self._levels[state])
+        return state
+
+    def apply_step(self, step: dict):
+        """Apply a schedule control step ({device: (id, state)}) with a single GPIO write"""
+        pins = []
+        states = []
+        for device, (id, state) in step.items():
+            if 'valve' in device:
+                if id not in range(1, self.num_valves + 1):
+                    raise ValueError(f"Invalid valve number[{id}]. Must be 1-{self.num_valves}")
+                pins.append(self.gpio_config["valve_pins"][str(id)])
+                self.state.valve_states[id] = state
+            elif device == 'pump':
+                pins.append(self.gpio_config["pump_pin"])
+                self.state.pump_states[1] = state
+            else:
+                continue
+            states.append(state)
+            self.logger.info(f"Setting actor [{device}] to [{state}]")
+
+        if self.debug or not pins:
+            return
+
+        self._GPIO.output(pins, [self._levels[state] for state in states])
+
     def set_pump(self, state: bool):
         """Set pump state (on/off)"""
         # Update state tracking in SystemState
-        if hasattr(self, 'state') and self.state:
-             self.state.pump_states[1] = state # Assuming pump ID 1
-        self.logger[0].info(f"Setting pump to {state}")
+        self.state.pump_states[1] = state # Assuming pump ID 1
+        self.logger.info(f"Setting pump to {state}")
         if self.debug:
             return state
 
-        import RPi.GPIO as GPIO
-        GPIO.output(self.gpio_config["pump_pin"], GPIO.LOW if state else GPIO.HIGH)
+        self._GPIO.output(self.gpio_config["pump_pin"], self._levels[state])
         return state
 
     def cleanup_gpio(self):
@@ -92,141 +141,245 @@ class Hydro(gpio_device):
         # Removed disable_auto_mode() call
         self.close_all_valves() # Ensure everything is off
         if not self.debug:
-            import RPi.GPIO as GPIO
-            GPIO.cleanup()
+            self._GPIO.cleanup()
 
     # Removed is_auto_mode, get_auto_settings, set_auto_mode, disable_auto_mode,
     # auto_execute_watering, _start_scheduler, _run_scheduler
 
+    def _get_stage_index(self) -> dict:
+        """
+        Returns the {stage: [sensor_id]} index of active sensors.
+        The index is only rebuilt when state.config_version changed since the last build.
+        """
+        if self._stage_index_version != self.state.config_version:
+            stage_index = defaultdict(list)
+            for sensor_id, config in self.state.sensor_configs.items():
+                if config.get('active', False):
+                    stage = config.get('stage')
+                    if stage in range(1, self.num_valves + 1):
+                        stage_index[stage].append(sensor_id)
+                        if sensor_id not in self._sensor_idx:
+                            self._sensor_idx[sensor_id] = len(self._last_seq)
+                            self._last_seq.append(0)
+                    elif stage is not None:
+                        self.logger.warning(f"Sensor {sensor_id} has invalid stage {stage}. Must be 1-{self.num_valves}")
+            self._stage_index = dict(stage_index)
+            self._stage_index_version = self.state.config_version
+        return self._stage_index
+
+    def on_new_reading(self, sensor_id: str, reading: dict):
+        """
+        Evaluates the stage of a sensor as soon as a new reading for it arrives.
+
+        Args:
+            sensor_id: Sensor that produced the reading
+            reading: The reading that was just stored in state.sensor_readings
+        """
+        config = self.state.sensor_configs.get(sensor_id)
+        if not config or not config.get('active', False):
+            return
+        stage = config.get('stage')
+        sensor_ids = self._get_stage_index().get(stage)
+        if not sensor_ids:
+            return
+        self._evaluate_stage(stage, sensor_ids)
+
     def check_sensor_watering(self):
         """Checks sensor readings and triggers watering if necessary."""
-        if not hasattr(self, 'state') or not self.state:
-             self.logger[0].error("SystemState not available in Hydro controller.")
-             return
-
-        active_sensors_by_stage = defaultdict(list)
-        for sensor_id, config in self.state.sensor_configs.items():
-            if config.get('active', False):
-                stage = config.get('stage')
-                if stage is not None:
-                    active_sensors_by_stage[stage].append(sensor_id)
-
-        for stage, sensor_ids in active_sensors_by_stage.items():
-            # --- Cooldown Logic: Check if waiting for readings ---
-            if self._waiting_for_readings[stage]:
-                readings_counted = 0
-                new_reading_found_this_check = False
-                for sensor_id in sensor_ids:
-                    if sensor_id in self.state.sensor_readings and self.state.sensor_readings[sensor_id]:
-                        latest_reading = self.state.sensor_readings[sensor_id][-1]
-                        last_processed_ts = self._last_reading_timestamp[sensor_id]
-                        current_ts = latest_reading.get('timestamp')
-
-                        # Check if this is a new reading since the last check for this sensor
-                        if current_ts and (last_processed_ts is None or current_ts > last_processed_ts):
-                             self._readings_since_watered[stage] += 1
-                             self._last_reading_timestamp[sensor_id] = current_ts # Update last processed timestamp
-                             new_reading_found_this_check = True
-                             self.logger[0].debug(f"Stage {stage}: Counted new reading from {sensor_id}. Total since watered: {self._readings_since_watered[stage]}")
-
-                if self._readings_since_watered[stage] >= 4:
-                    self.logger[0].info(f"Stage {stage}: Cooldown finished ({self._readings_since_watered[stage]} readings received). Enabling watering checks.")
-                    self._waiting_for_readings[stage] = False
-                    self._readings_since_watered[stage] = 0 # Reset counter
-                # else:
-                    # self.logger[0].debug(f"Stage {stage}: Still in cooldown ({self._readings_since_watered[stage]}/4 readings).")
-                continue # Skip watering check if in cooldown
-
-            # --- Watering Trigger Logic ---
-            if self._watering_active[stage]:
-                # self.logger[0].debug(f"Stage {stage}: Watering already active.")
-                continue # Skip if watering is already running for this stage
-
-            # Find the minimum moisture percentage among sensors for this stage
-            min_moisture_in_stage = 100.0
-            triggering_sensor = None
-            threshold = 100.0 # Default high, find the actual threshold below
-
-            # First find lowest moisture reading from all sensors in this stage
-            moisture_readings = []
+        for stage, sensor_ids in self._get_stage_index().items():
+            self._evaluate_stage(stage, sensor_ids)
+
+    def _evaluate_stage(self, stage: int, sensor_ids: list):
+        """Runs the cooldown and watering trigger logic for a single stage."""
+        # --- Cooldown Logic: Check if waiting for readings ---
+        if self._waiting_for_readings[stage]:
+            readings_counted = 0
+            new_reading_found_this_check = False
+            sensor_readings = self.state.sensor_readings
             for sensor_id in sensor_ids:
-                if sensor_id in self.state.sensor_readings and self.state.sensor_readings[sensor_id]:
-                    latest_reading = self.state.sensor_readings[sensor_id][-1]
-                    moisture = latest_reading.get('moisture_percent')
-                    if moisture is not None:
-                        moisture_readings.append((sensor_id, moisture))
-            
-            if moisture_readings:
-                # Get sensor with lowest moisture reading
-                triggering_sensor, min_moisture_in_stage = min(moisture_readings, key=lambda x: x[1])
-                threshold = self.state.sensor_configs[triggering_sensor].get('min_moisture', 50.0)
-
-            # Check if the minimum moisture is below the threshold
-            if triggering_sensor is not None and min_moisture_in_stage < threshold:
-                self.logger[0].info(f"Stage {stage}: Triggering watering. Sensor {triggering_sensor} reading: {min_moisture_in_stage:.2f}% < Threshold: {threshold:.2f}%")
-                self._watering_active[stage] = True
-                self._waiting_for_readings[stage] = True # Start cooldown period immediately
-                self._readings_since_watered[stage] = 0 # Reset reading count
-                # Clear last reading timestamps for sensors in this stage to ensure fresh counting
-                for s_id in sensor_ids:
-                    self._last_reading_timestamp[s_id] = None
-
-                # Start watering in a separate thread
-                watering_thread = threading.Thread(target=self._execute_stage_watering_thread, args=(stage, 300), daemon=True)
-                watering_thread.start()
+                readings = sensor_readings.get(sensor_id)
+                if readings:
+                    # Readings carry an increasing 'seq' assigned on ingestion (see MQTTClient)
+                    seq = readings[-1].get('seq', 0)
+                    idx = self._sensor_idx[sensor_id]
+
+                    # Check if this is a new reading since the last check for this sensor
+                    if seq > self._last_seq[idx]:
+                         self._readings_since_watered[stage] += 1
+                         self._last_seq[idx] = seq # Update last processed reading
+                         new_reading_found_this_check = True
+                         self.logger.debug("Stage %s: Counted new reading from %s. Total since watered: %s", stage, sensor_id, self._readings_since_watered[stage])
+
+            if self._readings_since_watered[stage] >= 4:
+                self.logger.info("Stage %s: Cooldown finished (%s readings received). Enabling watering checks.", stage, self._readings_since_watered[stage])
+                self._waiting_for_readings[stage] = False
+                self._readings_since_watered[stage] = 0 # Reset counter
             # else:
-                # self.logger[0].debug(f"Stage {stage}: Moisture level OK (Min: {min_moisture_in_stage:.2f}%, Threshold: {threshold:.2f}%).")
-
-
-    def _execute_stage_watering_thread(self, stage: int, duration: int):
-        """Executes the watering sequence for a specific stage in a thread."""
+                # self.logger.debug(f"Stage {stage}: Still in cooldown ({self._readings_since_watered[stage]}/4 readings).")
+            return # Skip watering check if in cooldown
+
+        # --- Watering Trigger Logic ---
+        if self._watering_active[stage]:
+            # self.logger.debug(f"Stage {stage}: Watering already active.")
+            return # Skip if watering is already running for this stage
+
+        # Find the minimum moisture percentage among sensors for this stage
+        min_moisture_in_stage = math.inf
+        triggering_sensor = None
+        threshold = 100.0 # Default high, find the actual threshold below
+
+        # Single pass over the latest reading of each sensor in this stage
+        sensor_readings = self.state.sensor_readings
+        for sensor_id in sensor_ids:
+            readings = sensor_readings.get(sensor_id)
+            if not readings:
+                continue
+            moisture = readings[-1].get('moisture_percent')
+            if moisture is not None and moisture < min_moisture_in_stage:
+                min_moisture_in_stage, triggering_sensor = moisture, sensor_id
+
+        if triggering_sensor is not None:
+            threshold = self.state.sensor_configs[triggering_sensor].get('min_moisture', 50.0)
+
+        # Check if the minimum moisture is below the threshold
+        if triggering_sensor is not None and min_moisture_in_stage < threshold:
+            self.logger.info("Stage %s: Triggering watering. Sensor %s reading: %.2f%% < Threshold: %.2f%%", stage, triggering_sensor, min_moisture_in_stage, threshold)
+            self._watering_active[stage] = True
+
+            # Start watering as a task on the event loop; without one the stage is checked again on the next reading
+            if not self._start_stage_watering(stage, 300):
+                return
+
+            self._waiting_for_readings[stage] = True # Start cooldown period once watering is scheduled
+            self._readings_since_watered[stage] = 0 # Reset reading count
+            # Clear last processed readings for sensors in this stage to ensure fresh counting
+            for s_id in sensor_ids:
+                self._last_seq[self._sensor_idx[s_id]] = 0
+        # else:
+            # self.logger.debug(f"Stage {stage}: Moisture level OK (Min: {min_moisture_in_stage:.2f}%, Threshold: {threshold:.2f}%).")
+
+
+    def _start_stage_watering(self, stage: int, duration: int) -> bool:
+        """
+        Schedules _execute_stage_watering on the event loop. Returns False if no loop is available.
+        Safe to call from the MQTT network thread as well as from the loop itself.
+        """
+        if self._loop is None or self._loop.is_closed():
+            self.logger.error(f"Stage {stage}: No event loop available, cannot start watering.")
+            self._watering_active[stage] = False
+            return False
+        self._watering_tasks[stage] = asyncio.run_coroutine_threadsafe(
+            self._execute_stage_watering(stage, duration), self._loop
+        )
+        return True
+
+    async def _execute_stage_watering(self, stage: int, duration: int):
+        """Executes the watering sequence for a specific stage as a cancellable task."""
         valve_id = stage # Assuming stage number corresponds directly to valve number
-        self.logger[0].info(f"Starting watering thread for Stage {stage} (Valve {valve_id}) for {duration} seconds.")
+        self.logger.info("Starting watering task for Stage %s (Valve %s) for %s seconds.", stage, valve_id, duration)
 
+        # Stage watering tasks all run on the event loop thread, so the count needs no lock
+        self._pump_refcount += 1
+        pump_released = False
         try:
-            # Ensure other valves for other active stages are not affected?
-            # For now, assume only one stage waters at a time controlled by _watering_active flag.
-            # If concurrent watering is needed, pump logic needs refinement.
-
             # 1. Turn on Pump
             self.set_pump(True)
-            time.sleep(1) # Small delay for pump pressure
+            await asyncio.sleep(1) # Small delay for pump pressure
 
             # 2. Open Valve
             self.set_valve(valve_id, True)
 
             # 3. Wait for duration
-            time.sleep(duration)
+            await asyncio.sleep(duration)
 
             # 4. Close Valve
             self.set_valve(valve_id, False)
-            time.sleep(1) # Small delay
-
-            # 5. Turn off Pump (only if no other stages are actively watering - check _watering_active)
-            # This check prevents turning off the pump if another stage started watering concurrently.
-            # A more robust solution might involve reference counting for pump usage.
-            if not any(self._watering_active.get(s, False) for s in self._watering_active if s != stage):
-                 self.set_pump(False)
-                 self.logger[0].info(f"Stage {stage}: Pump turned off as no other stages are active.")
+            await asyncio.sleep(1) # Small delay
+
+            # 5. Turn off Pump (only if no other stage is still using it)
+            pump_released = True
+            if self._release_pump():
+                 self.logger.info("Stage %s: Pump turned off as no other stages are active.", stage)
             else:
-                 self.logger[0].info(f"Stage {stage}: Pump left ON as other stages might be active.")
+                 self.logger.info("Stage %s: Pump left ON as other stages are active.", stage)
+
 
+            self.logger.info("Watering task for Stage %s completed successfully.", stage)
 
-            self.logger[0].info(f"Watering thread for Stage {stage} completed successfully.")
+        except asyncio.CancelledError:
+            # Whoever cancels (close_all_valves) is responsible for closing valves and pump
+            self.logger.info("Watering task for Stage %s was cancelled.", stage)
+            raise
 
         except Exception as e:
-            self.logger[0].error(f"Error during watering thread for Stage {stage}: {str(e)}")
+            self.logger.error("Error during watering task for Stage %s: %s", stage, e)
             # Ensure valve and potentially pump are turned off in case of error
             self.set_valve(valve_id, False)
-            if not any(self._watering_active.get(s, False) for s in self._watering_active if s != stage):
-                 self.set_pump(False)
-                 self.logger[0].error(f"Stage {stage}: Pump turned off due to error.")
+            if not pump_released:
+                pump_released = True
+                if self._release_pump():
+                     self.logger.error("Stage %s: Pump turned off due to error.", stage)
 
 
         finally:
+            if not pump_released:
+                self._pump_refcount -= 1
             # Mark watering as inactive for this stage
             self._watering_active[stage] = False
-            self.logger[0].debug(f"Stage {stage}: Watering marked as inactive.")
-
-
-    # Removed create_custom_schedule - might be added back later if needed
+            self._watering_tasks.pop(stage, None)
+            self.logger.debug("Stage %s: Watering marked as inactive.", stage)
+
+    def _release_pump(self) -> bool:
+        """Drops one pump reference and stops the pump if it was the last one. Returns True if stopped."""
+        self._pump_refcount -= 1
+        if self._pump_refcount == 0:
+            self.set_pump(False)
+            return True
+        return False
+
+
+    @staticmethod
+    def _compile_schedule_builder(num_valves: int):
+        """
+        Generates a schedule builder specialised for a fixed number of valves.
+
+        The valve sequence is unrolled into straight-line code once, so building a
+        schedule is a single call without sorting keys or creating step dicts. The
+        control steps are shared constants, wrapped in MappingProxyType so that any
+        attempt to modify one fails instead of changing every later schedule.
+
+        Schedule layout: pump on, 1s pressure delay, then each valve in turn with the
+        previous valve closed in the same step as the next one opens, and the last
+        valve closed together with the pump.
+        """
+        namespace = {'_PUMP_ON': MappingProxyType({'pump': (1, True)})}
+        body = ["_PUMP_ON", "1"]
+        for valve in range(1, num_valves + 1):
+            step = {}
+            if valve > 1:
+                step[f'valve_{valve - 1}'] = (valve - 1, False)
+            step[f'valve_{valve}'] = (valve, True)
+            namespace[f'_OPEN_{valve}'] = MappingProxyType(step)
+            body.append(f"_OPEN_{valve}")
+            body.append(f"d.get({valve}, 0)")
+        if num_valves:
+            namespace['_FINISH'] = MappingProxyType({f'valve_{num_valves}': (num_valves, False), 'pump': (1, False)})
+        else:
+            namespace['_FINISH'] = MappingProxyType({'pump': (1, False)})
+        body.append("_FINISH")
+
+        source = f"def _make_schedule(d):\n    return [{', '.join(body)}]\n"
+        exec(compile(source, f"<hydro schedule: {num_valves} valves>", "exec"), namespace)
+        return namespace['_make_schedule']
+
+    def create_custom_schedule(self, durations: dict) -> list:
+        """
+        Builds a watering schedule from per-valve durations.
+
+        Args:
+            durations: Mapping of valve number to watering duration in seconds
+
+        Returns:
+            List of read-only control steps ({device: (id, state)}) and wait steps (seconds)
+        """
+        return self._make_schedule(durations)
@@ -1,7 +1,22 @@
 import logging
 import os
+import time
 from logging.handlers import RotatingFileHandler
 
+class CachedFormatter(logging.Formatter):
+    """Formatter that renders the asctime seconds part once per second instead of once per record"""
+    _cached = (None, '') # (epoch second, formatted time)
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        cached_second, formatted = self._cached
+        if second != cached_second:
+            formatted = time.strftime(self.default_time_format, self.converter(second))
+            self._cached = (second, formatted)
+        return self.default_msec_format % (formatted, record.msecs)
+
 def setup_logging():
     # Create logger
     logger = logging.getLogger('hydro')
@@ -30,7 +45,7 @@ def setup_logging():
     console_handler.setLevel(logging.INFO)
 
     # Create formatters
-    file_formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    file_formatter = CachedFormatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
     console_formatter = logging.Formatter('%(levelname)s: %(message)s')
 
     # Add formatters to handlers
@@ -1,18 +1,16 @@
 from gpio_device import gpio_device
-import schedule
-import time
-import threading
+import asyncio
 from datetime import datetime, timedelta
 
 class Lux(gpio_device):
-    def __init__(self, logger, pin: int = 16, freq: int = 1000, debug: bool = False, scheduler=None):
+    def __init__(self, logger, pin: int = 16, freq: int = 1000, debug: bool = False, loop=None):
         """Initialize PWM LED controller
         Args:
             logger: Logger instance
             pin (int): GPIO pin number (default 16)
             freq (int): PWM frequency in Hz (default 1000Hz)
             debug (bool): Run in debug mode without GPIO (default False)
-            scheduler: Optional scheduler instance (for testing)
+            loop: Optional event loop for the auto mode timers (see set_event_loop)
         """
         self._pin = pin
         self._freq = freq
@@ -24,17 +22,21 @@ class Lux(gpio_device):
         # Auto mode attributes
         self._auto_mode = False
         self._start_time = None
+        self._start_hour = 0
+        self._start_minute = 0
         self._duration_hours = 0
+        self._duration_delta = timedelta(0)
         self._auto_brightness = 100
-        self._turn_off_job = None
-        self._turn_on_job = None
-        self._scheduler_thread = None
-        self._scheduler_running = False
-        self._scheduler = scheduler if scheduler is not None else schedule
+        self._next_turn_on = None # datetime of the next scheduled auto turn on
+        self._turn_off_job = None # asyncio.TimerHandle
+        self._turn_on_job = None # asyncio.TimerHandle
+        self._loop = loop
         
         self._logger.info(f'led controller on {self._pin} with frequency of {self._freq}Hz')
+        self._GPIO = None # RPi.GPIO module, bound once when running on hardware
         if not debug:
             import RPi.GPIO as GPIO
+            self._GPIO = GPIO
             
             # Setup GPIO
             GPIO.setmode(GPIO.BCM)
@@ -50,8 +52,11 @@ class Lux(gpio_device):
             level (float): Brightness level 0-100
         """
         # Validate and clamp input 
-        self._current_level = max(0, min(100, level))
-        print(f"Setting current level to : {self._current_level}")
+        level = max(0, min(100, level))
+        if level == self._current_level:
+            return # already at this level, skip the duty cycle write
+        self._current_level = level
+        self._logger.debug("Setting current level to : %s", self._current_level)
         if not self._debug:
             self._pwm.ChangeDutyCycle(self._current_level)
             
@@ -105,12 +110,11 @@ class Lux(gpio_device):
         
     def cleanup_gpio(self) -> None:
         """Cleanup GPIO resources"""
-        self.disable_auto_mode()  # Stop scheduler if running
+        self.disable_auto_mode()  # Cancel pending timers
         if not self._debug:
             if self._pwm:
                 self._pwm.stop()
-            import RPi.GPIO as GPIO
-            GPIO.cleanup(self._pin)
+            self._GPIO.cleanup(self._pin)
             
     def set_auto_mode(self, start_time: str, duration_hours: int, brightness: float = 100):
         """Set auto mode with start time, duration, and brightness
@@ -126,40 +130,39 @@ class Lux(gpio_device):
         # Set new auto mode parameters
         self._auto_mode = True
         self._start_time = start_time
+        self._start_hour, self._start_minute = map(int, start_time.split(':'))
         self._duration_hours = duration_hours
+        self._duration_delta = timedelta(hours=duration_hours)
         self._auto_brightness = max(0, min(100, brightness))
         
-        # Schedule the turn on job
-        self._turn_on_job = self._scheduler.every().day.at(start_time).do(self.auto_turn_on)
         self._logger.info(f"Auto mode enabled for light {self._pin}. Start: {start_time}, Duration: {duration_hours}h, Brightness: {brightness}%")
-        
-        # Start the scheduler thread if not already running
-        self._start_scheduler()
-        
-        # Check if we should turn on immediately (if current time is between start time and end time)
-        self._check_if_should_be_on()
+
+        # Schedule the turn on timer and check if we should turn on immediately
+        # (if current time is between start time and end time)
+        self._arm_timers()
 
     def disable_auto_mode(self):
-        """Disable auto mode and clear all schedules"""
+        """Disable auto mode and cancel all timers"""
         if self._auto_mode:
             self._auto_mode = False
             
-            # Clear scheduled jobs
+            # Cancel scheduled timers
             if self._turn_on_job:
-                self._scheduler.cancel_job(self._turn_on_job)
+                self._turn_on_job.cancel()
                 self._turn_on_job = None
                 
             if self._turn_off_job:
-                self._scheduler.cancel_job(self._turn_off_job)
+                self._turn_off_job.cancel()
                 self._turn_off_job = None
-                
+
+            self._next_turn_on = None
             self._logger.info(f"Auto mode disabled for light {self._pin}")
-            
-            # Stop scheduler thread if no other lights are using it
-            if self._scheduler_thread and self._scheduler_thread.is_alive():
-                self._scheduler_running = False
-                self._scheduler_thread.join(timeout=2)
-                self._scheduler_thread = None
+
+    def set_event_loop(self, loop: asyncio.AbstractEventLoop):
+        """Set the event loop the auto mode timers run on and arm them if auto mode is enabled"""
+        self._loop = loop
+        if self._auto_mode:
+            self._arm_timers()
 
     def auto_turn_on(self, current_time=None):
         """Turn on light automatically based on schedule with specified brightness
@@ -170,14 +173,18 @@ class Lux(gpio_device):
         if self._auto_mode:
             self.turn_on(self._auto_brightness)
             
-            # Clear any existing turn-off job
+            # Clear any existing turn-off timer
             if self._turn_off_job:
-                schedule.cancel_job(self._turn_off_job)
+                self._turn_off_job.cancel()
             
             # Schedule turn off after duration
             now = current_time if current_time is not None else datetime.now()
-            turn_off_time = now + timedelta(hours=self._duration_hours)
-            self._turn_off_job = self._scheduler.every().day.at(turn_off_time.strftime("%H:%M")).do(self.auto_turn_off)
+            self._turn_off_job = self._call_later(self._duration_hours * 3600, self.auto_turn_off)
+
+            # Re-arm the turn on timer for the next day
+            if self._next_turn_on is not None:
+                self._next_turn_on += timedelta(days=1)
+                self._turn_on_job = self._call_later((self._next_turn_on - now).total_seconds(), self.auto_turn_on)
             
             log_time = self._start_time if current_time is None else current_time.strftime("%H:%M")
             self._logger.info(f"Auto turning on light at {log_time} for {self._duration_hours} hours with brightness {self._auto_brightness}%")
@@ -189,21 +196,26 @@ class Lux(gpio_device):
             self._logger.info(f"Auto turning off light after {self._duration_hours} hours")
             self._turn_off_job = None
 
-    def _start_scheduler(self):
-        """Start the scheduler thread if not already running"""
-        if not self._scheduler_thread or not self._scheduler_thread.is_alive():
-            self._scheduler_running = True
-            self._scheduler_thread = threading.Thread(target=self._run_scheduler, daemon=True)
-            self._scheduler_thread.start()
-            self._logger.info(f"Started scheduler thread for light {self._pin}")
+    def _call_later(self, delay: float, callback):
+        """Schedule callback on the event loop, returns None if no loop is set yet"""
+        if self._loop is None:
+            return None
+        return self._loop.call_later(max(0, delay), callback)
+
+    def _arm_timers(self):
+        """Schedule the next auto turn on and turn on right away if inside the on period"""
+        if self._loop is not None:
+            if self._turn_on_job:
+                self._turn_on_job.cancel()
+            now = datetime.now()
+            next_turn_on = now.replace(hour=self._start_hour, minute=self._start_minute, second=0, microsecond=0)
+            if next_turn_on <= now:
+                next_turn_on += timedelta(days=1)
+            self._next_turn_on = next_turn_on
+            self._turn_on_job = self._call_later((next_turn_on - now).total_seconds(), self.auto_turn_on)
+
+        self._check_if_should_be_on()
 
-    def _run_scheduler(self):
-        """Run the scheduler in a separate thread"""
-        while self._scheduler_running:
-            schedule.run_pending()
-            time.sleep(1)
-        self._logger.info(f"Scheduler thread stopped for light {self._pin}")
-        
     def _check_if_should_be_on(self):
         """Check if the light should be on based on current time and auto settings"""
         if not self._auto_mode or not self._start_time:
@@ -212,11 +224,10 @@ class Lux(gpio_device):
         try:
             # Parse start time
             current_time = datetime.now()
-            start_hour, start_minute = map(int, self._start_time.split(':'))
-            start_time = current_time.replace(hour=start_hour, minute=start_minute, second=0, microsecond=0)
+            start_time = current_time.replace(hour=self._start_hour, minute=self._start_minute, second=0, microsecond=0)
             
             # Calculate end time
-            end_time = start_time + timedelta(hours=self._duration_hours)
+            end_time = start_time + self._duration_delta
             
             # Handle case where end time is on the next day
             if end_time < start_time:
@@ -226,13 +237,15 @@ class Lux(gpio_device):
                     # Schedule turn off
                     if current_time <= end_time:
                         seconds_until_off = (end_time - current_time).total_seconds()
-                        self._turn_off_job = self._scheduler.every(seconds_until_off).seconds.do(self.auto_turn_off)
+                        self._turn_off_job = self._call_later(seconds_until_off, self.auto_turn_off)
             else:
                 # If current time is between start and end time, light should be on
                 if start_time <= current_time <= end_time:
                     self.turn_on(self._auto_brightness)
                     # Schedule turn off
                     seconds_until_off = (end_time - current_time).total_seconds()
-                    self._turn_off_job = self._scheduler.every(seconds_until_off).seconds.do(self.auto_turn_off)
+                    if self._turn_off_job:
+                        self._turn_off_job.cancel()
+                    self._turn_off_job = self._call_later(seconds_until_off, self.auto_turn_off)
         except Exception as e:
             self._logger.error(f"Error checking if light should be on: {str(e)}")
@@ -1,10 +1,14 @@
 import asyncio
+import dataclasses
+import functools
+import hashlib
 import json
 import os
+import re
 import signal
 from datetime import datetime, timedelta
-import sys
-from typing import Any, Dict, Optional 
+from types import MappingProxyType
+from typing import Any, Mapping, Optional 
 
 import aiohttp
 import aiohttp_cors
@@ -12,19 +16,112 @@ import aiohttp_jinja2
 import jinja2
 from aiohttp import web
 
+try:
+    import orjson
+except ImportError: # Fall back to the stdlib encoder
+    orjson = None
+
+try:
+    import uvloop
+except ImportError: # Fall back to the stdlib event loop
+    uvloop = None
+
 from camera import get_camera_bytes
 from controller import Controller
 from db import DatabaseAdapter
 from helper import is_raspberry_pi, render
 from logger import setup_logging
-from state import SystemState
+from state import SystemState, WateringState
+
+try:
+    from mqtt_client import MQTTClient
+except ImportError: # paho-mqtt not installed, MQTT features are disabled
+    MQTTClient = None
+
+# Templates ship next to this module, independent of the working directory
+TEMPLATE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'templates')
+
+# HH:MM in 24-hour format, ASCII digits only
+TIME_FORMAT = re.compile(r'(?:[01][0-9]|2[0-3]):[0-5][0-9]')
+
+# Form values that switch auto mode on, checked without lowering the submitted string
+TRUTHY_VALUES = frozenset({'true', 'True', 'TRUE', '1', 'on', 'yes'})
+
+def _timestamp() -> str:
+    """Return the current local time as an ISO 8601 string with second precision."""
+    return datetime.now().isoformat(timespec='seconds')
+
+async def _read_json(request: web.Request) -> Any:
+    """Like request.json(), but decodes the raw body with orjson when it is installed."""
+    body = await request.read()
+    return orjson.loads(body) if orjson is not None else json.loads(body)
+
+def _json_response(data: Any, status: int = 200) -> web.Response:
+    """Like web.json_response, but encoded with orjson when it is installed. Dataclasses are serialized as objects."""
+    if orjson is not None:
+        # State dicts are keyed by int ids, which orjson only accepts with OPT_NON_STR_KEYS
+        body = orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+    else:
+        body = json.dumps(data, separators=(',', ':'), default=dataclasses.asdict).encode()
+    return web.Response(body=body, status=status, content_type='application/json')
+
+@functools.lru_cache(maxsize=4)
+def _read_config(path: str, mtime_ns: int) -> Mapping[str, Any]:
+    """
+    Parse a JSON config file, cached per path and modification time.
+    Every app built in this process (tests included) gets the same mapping until the file changes.
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    # Read-only view, the parsed config is shared by every consumer
+    return MappingProxyType(orjson.loads(data) if orjson is not None else json.loads(data))
 
 class HydroControlApp:
     """Main application for the Hydro Control System."""
+
+    __slots__ = (
+        'config', 'logger', 'db', 'debug', 'current_state', 'controller', 'app', 'runner',
+        'status_task', 'humidity_check_task', 'mqtt_status_task', 'mqtt_publish_task', 'mqtt_client',
+        'home_page',
+    )
     
     CONFIG_FILE = 'config.json'
-    TEMPLATE_DIR = 'templates'
     SERVER_PORT = 5000
+    MQTT_PUBLISH_DELAY = 0.05 # seconds, state changes within this window share one publish
+
+    # (method, path, handler method name)
+    _ROUTES = (
+        ('GET', '/', 'home'),
+        ('GET', '/camera/{camera_id}', 'get_camera_image'),
+        ('POST', '/camera/{camera_id}/take/picture', 'take_picture'),
+        ('POST', '/cameras/take/picture', 'take_all_pictures'),
+        ('POST', '/water/sequence', 'watering_sequence'),
+        ('GET', '/water/status', 'get_watering_status'),
+        ('POST', '/water/cancel', 'cancel_watering'),
+        ('POST', '/water/auto', 'set_watering_auto_mode'),
+        ('GET', '/water/auto', 'get_watering_auto_settings'),
+        ('POST', '/light/{light_id}/toggle', 'toggle_static_light'),
+        ('POST', '/light/{light_id}/brightness', 'set_light_brightness'),
+        ('POST', '/light/{light_id}/auto', 'set_light_auto_mode'),
+        ('GET', '/light/{light_id}/auto', 'get_light_auto_settings'),
+        ('POST', '/sensor/config', 'set_sensor_config'),
+        ('POST', '/sensor/toggle', 'toggle_sensor_active'),
+        # --- Fan Control Routes ---
+        ('GET', '/api/fan/status', 'get_fan_status'),
+        ('POST', '/api/fan/target', 'set_fan_target'),
+        ('POST', '/api/fan/control', 'set_fan_control'),
+        ('POST', '/api/fan/manual', 'set_fan_manual'),
+    )
+
+    # Same options for every origin, normalized once by aiohttp_cors at import
+    _CORS_DEFAULTS = {
+        "*": aiohttp_cors.ResourceOptions(
+            allow_credentials=True,
+            expose_headers="*",
+            allow_headers="*",
+            allow_methods=("GET", "POST", "PUT", "DELETE", "OPTIONS")
+        )
+    }
     
     def __init__(self):
         """Initialize the Hydro Control application."""
@@ -44,30 +141,34 @@ class HydroControlApp:
         self.status_task = None
         self.humidity_check_task = None # Add task for humidity check
         self.mqtt_status_task = None # Add task for periodic MQTT status
+        self.mqtt_publish_task = None # Pending coalesced MQTT status publish
+        self.runner = None # web.AppRunner, set once the server is started
+        self.home_page = None # (state versions, rendered bytes) of the last home page, see home()
         
         # Initialize MQTT client if configured
         # Initialize MQTT client if configured
         self.mqtt_client = None # Initialize as None
-        if 'mqtt' in self.config:
+        if 'mqtt' in self.config and MQTTClient is None:
+            self.logger.error("mqtt_client.py not found or paho-mqtt not installed. MQTT features disabled.")
+        elif 'mqtt' in self.config:
             try:
-                from mqtt_client import MQTTClient
                 self.mqtt_client = MQTTClient(self.current_state, self.config)
                 if not self.mqtt_client.connect():
                     self.logger.error("MQTT Client failed to connect during initialization.")
                     self.mqtt_client = None # Set back to None if connection failed
                 else:
                     self.logger.info("MQTT Client connected successfully.")
-            except ImportError:
-                self.logger.error("mqtt_client.py not found or paho-mqtt not installed. MQTT features disabled.")
             except Exception as e:
                 self.logger.error(f"Failed to initialize MQTT client: {e}", exc_info=True)
 
     def _trigger_mqtt_status_update(self):
         """Safely triggers the MQTT status update if the client is available."""
         if self.mqtt_client:
+            if self.mqtt_publish_task is not None and not self.mqtt_publish_task.done():
+                return # The pending publish has not read the state yet, it will include this change
             try:
                 # Run in a separate task to avoid blocking the caller
-                asyncio.create_task(self._publish_mqtt_status_async())
+                self.mqtt_publish_task = asyncio.create_task(self._publish_mqtt_status_async())
             except Exception as e:
                 self.logger.error(f"Error scheduling MQTT status update: {e}", exc_info=True)
         else:
@@ -75,128 +176,101 @@ class HydroControlApp:
 
     async def _publish_mqtt_status_async(self):
         """Asynchronously publish status to prevent blocking."""
+        # Let a burst of state changes settle so they go out as one message
+        await asyncio.sleep(self.MQTT_PUBLISH_DELAY)
         if self.mqtt_client:
-            # Add a small delay to allow state changes to settle if needed
-            # await asyncio.sleep(0.1)
             self.mqtt_client.publish_status()
 
     @classmethod
-    def _load_config(cls) -> Dict[str, Any]:
-        """Load configuration from JSON file."""
-        with open(cls.CONFIG_FILE) as f:
-            return json.load(f)
+    def _load_config(cls) -> Mapping[str, Any]:
+        """Load configuration from JSON file, parsing it again only when the file has changed."""
+        return _read_config(cls.CONFIG_FILE, os.stat(cls.CONFIG_FILE).st_mtime_ns)
 
     def _create_web_app(self) -> web.Application:
         """Set up and configure the web application."""
         app = web.Application()
         
         # Configure templating engine
-        aiohttp_jinja2.setup(
+        env = aiohttp_jinja2.setup(
             app,
-            loader=jinja2.FileSystemLoader(os.path.join(os.getcwd(), self.TEMPLATE_DIR))
+            loader=jinja2.FileSystemLoader(TEMPLATE_PATH),
+            auto_reload=False, # Templates don't change at runtime, skip the per-render mtime check
+            # Keep compiled templates across restarts, the cache is keyed by source checksum
+            bytecode_cache=jinja2.FileSystemBytecodeCache()
         )
+        # Compile the page template now rather than on the first request
+        env.get_template('index.html')
+
+        # One HTTP client session for all camera requests, see _open_http_session
+        app.on_startup.append(self._open_http_session)
+        app.on_cleanup.append(self._close_http_session)
 
         # Add routes and CORS
         self._setup_routes(app)
-        self._setup_cors(app)
         
         return app
 
+    async def _open_http_session(self, app: web.Application) -> None:
+        """Create the shared client session so camera requests reuse pooled connections."""
+        # aiohttp's default timeout: picture triggers can take a while, image fetches set their own
+        app['http_session'] = aiohttp.ClientSession(
+            # Keep camera connections open across the refresh/status intervals
+            connector=aiohttp.TCPConnector(limit=32, keepalive_timeout=60)
+        )
 
-    def _setup_cors(self, app: web.Application) -> None:
-        """Configure Cross-Origin Resource Sharing for the application."""
-        cors = aiohttp_cors.setup(app, defaults={
-            "*": aiohttp_cors.ResourceOptions(
-                allow_credentials=True,
-                expose_headers="*",
-                allow_headers="*",
-                allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"]
-            )
-        })
-        
-        # Apply CORS to all routes
-        for route in list(app.router.routes()):
-            cors.add(route)
+    async def _close_http_session(self, app: web.Application) -> None:
+        """Close the shared client session."""
+        await app['http_session'].close()
 
     def _setup_routes(self, app: web.Application) -> None:
-        """Set up route handlers for the application."""
-        routes = [
-            ('GET', '/', self.home),
-            ('GET', '/camera/{camera_id}', self.get_camera_image),
-            ('POST', '/camera/{camera_id}/take/picture', self.take_picture),
-            ('POST', '/water/sequence', self.watering_sequence),
-            ('GET', '/water/status', self.get_watering_status),  # Added missing route for status
-            ('POST', '/water/cancel', self.cancel_watering),     # Added missing route for cancellation
-            ('POST', '/water/auto', self.set_watering_auto_mode),  # New route for watering auto mode
-            ('GET', '/water/auto', self.get_watering_auto_settings),  # New route for watering auto settings
-            ('POST', '/water/durations', self.set_watering_durations),  # New route for watering durations
-            ('POST', '/light/{light_id}/toggle', self.toggle_static_light),
-            ('POST', '/light/{light_id}/brightness', self.set_light_brightness),
-            ('POST', '/light/{light_id}/auto', self.set_light_auto_mode),
-            ('GET', '/light/{light_id}/auto', self.get_light_auto_settings),
-            ('POST', '/sensor/config', self.set_sensor_config),
-            ('POST', '/sensor/toggle', self.toggle_sensor_active),
-            # --- Fan Control Routes ---
-            ('GET', '/api/fan/status', self.get_fan_status),
-            ('POST', '/api/fan/target', self.set_fan_target),
-            ('POST', '/api/fan/control', self.set_fan_control),
-            ('POST', '/api/fan/manual', self.set_fan_manual),
-        ]
-        
-        for method, path, handler in routes:
-            if method == 'GET':
-                app.router.add_get(path, handler)
-            elif method == 'POST':
-                app.router.add_post(path, handler)
+        """Set up route handlers and Cross-Origin Resource Sharing for the application."""
+        cors = aiohttp_cors.setup(app, defaults=self._CORS_DEFAULTS)
+
+        # Apply CORS to each route as it is registered
+        for method, path, handler_name in self._ROUTES:
+            route = app.router.add_route(method, path, getattr(self, handler_name))
+            cors.add(route)
 
     async def watering_sequence(self, request: web.Request) -> web.Response:
         """Endpoint to trigger the watering sequence with progress tracking."""
         try:
             # Check if a watering sequence is already running
-            if hasattr(self.current_state, 'watering_task') and not hasattr(self.current_state.watering_task, 'done' ):
-                return web.json_response({
+            if self.current_state.watering_task is not None and not self.current_state.watering_task.done():
+                return _json_response({
                     'status': 'error',
                     'message': 'A watering sequence is already in progress'
                 }, status=409)  # Conflict
                 
             # Initialize watering state with progress tracking
-            self.current_state.watering_state = {
-                'status': 'starting',
-                'progress_percent': 0,
-                'current_zone': None,
-                'zones_completed': 0,
-                'total_zones': self.current_state.wtrctrl.num_valves,
-                'started_at': datetime.now().isoformat(),
-                'estimated_completion': None
-            }
+            # The sequence settles the valves for a second before the schedule starts
+            started_at = datetime.now()
+            total_duration = 1 + self.controller.calculate_total_watering_duration(self.current_state)
+            self.current_state.watering_state = WateringState(
+                status='starting',
+                total_zones=self.current_state.wtrctrl.num_valves,
+                started_at=started_at.isoformat(timespec='seconds'),
+                estimated_completion=(started_at + timedelta(seconds=total_duration)).isoformat(timespec='seconds')
+            )
             
             # Create a progress tracking callback that updates the watering_state
             async def progress_tracker(progress: int, zone: int = None, status: str = None):
-                if not hasattr(self.current_state, 'watering_state'):
+                watering_state = self.current_state.watering_state
+                if watering_state is None:
                     return
                     
-                self.current_state.watering_state['progress_percent'] = progress
+                # Nothing below awaits, so /water/status never sees a half-applied update
+                watering_state.progress_percent = progress
                 
                 if zone is not None:
-                    self.current_state.watering_state['current_zone'] = f"Zone {zone}"
+                    watering_state.current_zone = f"Zone {zone}"
                 
                 if status is not None:
-                    self.current_state.watering_state['status'] = status
+                    watering_state.status = status
                     
-                    if status == 'zone_completed' and 'zones_completed' in self.current_state.watering_state:
-                        self.current_state.watering_state['zones_completed'] += 1
-                    
-                    if status == 'in_progress' and progress == 0:
-                        # Calculate and set estimated completion time
-                        total_duration = self.controller.calculate_total_watering_duration(self.current_state)
-                        completion_time = datetime.now() + timedelta(seconds=total_duration)
-                        self.current_state.watering_state['estimated_completion'] = completion_time.isoformat()
-                        
-                    if status == 'completed':
-                        self.current_state.watering_state['completed_at'] = datetime.now().isoformat()
+                    if status == 'zone_completed':
+                        watering_state.zones_completed += 1
                         
-                    if status == 'error':
-                        self.current_state.watering_state['error_at'] = datetime.now().isoformat()
+                    # completed_at / error_at are stamped once by on_task_done
             
             # Execute watering sequence asynchronously to not block the response
             task = asyncio.create_task(self.controller.execute_watering_sequence(
@@ -208,25 +282,25 @@ class HydroControlApp:
             def on_task_done(task):
                 try:
                     task.result()  # This will raise exception if task failed
-                    if hasattr(self.current_state, 'watering_state'):
-                        self.current_state.watering_state['status'] = 'completed'
-                        self.current_state.watering_state['completed_at'] = datetime.now().isoformat()
+                    if self.current_state.watering_state is not None:
+                        self.current_state.watering_state.status = 'completed'
+                        self.current_state.watering_state.completed_at = _timestamp()
                 except asyncio.CancelledError:
-                    if hasattr(self.current_state, 'watering_state'):
-                        self.current_state.watering_state['status'] = 'cancelled'
+                    if self.current_state.watering_state is not None:
+                        self.current_state.watering_state.status = 'cancelled'
                 except Exception as e:
                     self.logger.error(f"Watering sequence failed: {str(e)}", exc_info=True)
-                    if hasattr(self.current_state, 'watering_state'):
-                        self.current_state.watering_state['status'] = 'error'
-                        self.current_state.watering_state['error_message'] = str(e)
-                        self.current_state.watering_state['error_at'] = datetime.now().isoformat()
+                    if self.current_state.watering_state is not None:
+                        self.current_state.watering_state.status = 'error'
+                        self.current_state.watering_state.error_message = str(e)
+                        self.current_state.watering_state.error_at = _timestamp()
             
             task.add_done_callback(on_task_done)  # Add completion callback
             
             # Store the task for status checks or cancellation
             self.current_state.watering_task = task
             
-            return web.json_response({
+            return _json_response({
                 'status': 'watering_sequence_started',
                 'message': 'Watering sequence has been initiated',
                 'watering_state': self.current_state.watering_state
@@ -234,49 +308,36 @@ class HydroControlApp:
         
         except Exception as e:
             # Update state to reflect error
-            self.current_state.watering_state = {
-                'status': 'error',
-                'error_message': str(e),
-                'timestamp': datetime.now().isoformat()
-            }
+            self.current_state.watering_state = WateringState(
+                status='error',
+                error_message=str(e),
+                error_at=_timestamp()
+            )
             
             self.logger.error(f"Error initiating watering sequence: {str(e)}", exc_info=True)
-            return web.json_response({
+            return _json_response({
                 'status': 'error',
                 'message': f"Failed to start watering sequence: {str(e)}"
             }, status=500)
 
     async def get_watering_status(self, request: web.Request) -> web.Response:
         """Endpoint to check the current status of an ongoing watering sequence."""
-        if not hasattr(self.current_state, 'watering_state'):
-            return web.json_response({
+        if self.current_state.watering_state is None:
+            return _json_response({
                 'status': 'no_watering',
                 'message': 'No watering sequence is currently active'
             })
         
-        # Check if the task has completed but status wasn't updated
-        if hasattr(self.current_state, 'watering_task'):
-            if self.current_state.watering_task.done():
-                try:
-                    self.current_state.watering_task.result()  # Will raise if there was an exception
-                    if self.current_state.watering_state['status'] not in ['completed', 'cancelled', 'error']:
-                        self.current_state.watering_state['status'] = 'completed'
-                        self.current_state.watering_state['completed_at'] = datetime.now().isoformat()
-                except asyncio.CancelledError:
-                    self.current_state.watering_state['status'] = 'cancelled'
-                except Exception as e:
-                    self.current_state.watering_state['status'] = 'error'
-                    self.current_state.watering_state['error_message'] = str(e)
-        
+        # on_task_done records the final status as soon as the task finishes
         # Return the current watering state with real-time progress
-        return web.json_response({
+        return _json_response({
             'watering_state': self.current_state.watering_state
         })
 
     async def cancel_watering(self, request: web.Request) -> web.Response:
         """Endpoint to cancel an ongoing watering sequence."""
-        if not hasattr(self.current_state, 'watering_task') or self.current_state.watering_task.done():
-            return web.json_response({
+        if self.current_state.watering_task is None or self.current_state.watering_task.done():
+            return _json_response({
                 'status': 'no_watering',
                 'message': 'No watering sequence is currently active'
             })
@@ -286,22 +347,22 @@ class HydroControlApp:
             self.current_state.watering_task.cancel()
             
             # Update watering state
-            if hasattr(self.current_state, 'watering_state'):
-                self.current_state.watering_state['status'] = 'cancelled'
-                self.current_state.watering_state['cancelled_at'] = datetime.now().isoformat()
+            if self.current_state.watering_state is not None:
+                self.current_state.watering_state.status = 'cancelled'
+                self.current_state.watering_state.cancelled_at = _timestamp()
             
             # Ensure all valves are closed
             self.current_state.wtrctrl.close_all_valves()
             
-            return web.json_response({
+            return _json_response({
                 'status': 'cancelled',
                 'message': 'Watering sequence has been cancelled',
-                'watering_state': self.current_state.watering_state if hasattr(self.current_state, 'watering_state') else None
+                'watering_state': self.current_state.watering_state
             })
         
         except Exception as e:
             self.logger.error(f"Error cancelling watering sequence: {str(e)}", exc_info=True)
-            return web.json_response({
+            return _json_response({
                 'status': 'error',
                 'message': f"Failed to cancel watering sequence: {str(e)}"
             }, status=500)
@@ -313,7 +374,7 @@ class HydroControlApp:
             return web.Response(text="Invalid light ID", status=400)
             
         try:
-            self.current_state = self.controller.set_light(self.current_state, light_id)
+            self.controller.set_light(self.current_state, light_id)
             return render(request, self.current_state)
         except Exception as e:
             self.logger.error(f"Error toggling light {light_id}: {str(e)}", exc_info=True)
@@ -330,7 +391,7 @@ class HydroControlApp:
             return web.Response(text="Invalid brightness value", status=400)
                 
         try:
-            self.current_state = self.controller.set_brightness(
+            self.controller.set_brightness(
                 self.current_state, light_id, brightness
             )
             return render(request, self.current_state)
@@ -346,7 +407,7 @@ class HydroControlApp:
             
         try:
             form = await request.post()
-            auto_mode = form.get('auto_mode', 'false').lower() == 'true'
+            auto_mode = form.get('auto_mode', '') in TRUTHY_VALUES
             
             if auto_mode:
                 start_time = form.get('start_time')
@@ -372,13 +433,12 @@ class HydroControlApp:
                     except (ValueError, TypeError):
                         return web.Response(text="Invalid brightness format. Must be a number between 0 and 100.", status=400)
                     
-                print(light_id)
-                self.current_state = self.controller.set_light_auto_mode(
+                self.controller.set_light_auto_mode(
                     self.current_state, light_id, True, start_time, duration_hours, brightness
                 )
             else:
                 # Disable auto mode
-                self.current_state = self.controller.set_light_auto_mode(
+                self.controller.set_light_auto_mode(
                     self.current_state, light_id, False
                 )
                 
@@ -399,19 +459,19 @@ class HydroControlApp:
             settings = self.controller.get_light_auto_settings(self.current_state, light_id)
             
             if settings is None:
-                return web.json_response({
+                return _json_response({
                     'status': 'error',
                     'message': f'Light #{light_id} not found'
                 }, status=404)
                 
-            return web.json_response({
+            return _json_response({
                 'status': 'success',
                 'settings': settings
             })
             
         except Exception as e:
             self.logger.error(f"Error getting auto settings for light {light_id}: {str(e)}", exc_info=True)
-            return web.json_response({
+            return _json_response({
                 'status': 'error',
                 'message': f"Error getting auto settings: {str(e)}"
             }, status=500)
@@ -420,19 +480,19 @@ class HydroControlApp:
         """Endpoint to set auto mode for watering."""
         try:
             form = await request.post()
-            auto_mode = form.get('auto_mode', 'false').lower() == 'true'
+            auto_mode = form.get('auto_mode', '') in TRUTHY_VALUES
             
             if auto_mode:
                 start_time = form.get('start_time')
                 if not start_time or not self._is_valid_time_format(start_time):
                     return web.Response(text="Invalid start time format. Use HH:MM in 24-hour format.", status=400)
                 
-                self.current_state = self.controller.set_watering_auto_mode(
+                self.controller.set_watering_auto_mode(
                     self.current_state, True, start_time
                 )
             else:
                 # Disable auto mode
-                self.current_state = self.controller.set_watering_auto_mode(
+                self.controller.set_watering_auto_mode(
                     self.current_state, False
                 )
                 
@@ -448,14 +508,14 @@ class HydroControlApp:
         try:
             settings = self.controller.get_watering_auto_settings(self.current_state)
             
-            return web.json_response({
+            return _json_response({
                 'status': 'success',
                 'settings': settings
             })
             
         except Exception as e:
             self.logger.error(f"Error getting auto settings for watering: {str(e)}", exc_info=True)
-            return web.json_response({
+            return _json_response({
                 'status': 'error',
                 'message': f"Error getting auto settings: {str(e)}"
             }, status=500)
@@ -470,25 +530,38 @@ class HydroControlApp:
             return web.Response(text="Camera not found", status=404)
         
         try:
-            print(f"Getting image for {self.current_state.camera_endpoints[camera_id]}");
-            result = await get_camera_bytes(self.current_state.camera_endpoints[camera_id])
+            self.logger.debug("Getting image for %s", self.current_state.camera_endpoints[camera_id])
+            result = await get_camera_bytes(self.current_state.camera_endpoints[camera_id], request.app['http_session'])
             
             if result is None:
                 return web.Response(text="Error loading camera image", status=500)
                 
             image_bytes = result[0] if isinstance(result, tuple) else result
             
-            if image_bytes is None:
+            if not isinstance(image_bytes, bytes):
                 return web.Response(text="Error loading camera image", status=500)
+
+            # Let the browser revalidate its copy, an unchanged picture is answered without a body
+            etag = f'"{hashlib.blake2b(image_bytes, digest_size=8).hexdigest()}"'
+            headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+            if request.headers.get('If-None-Match') == etag:
+                return web.Response(status=304, headers=headers)
                 
-            return web.Response(body=image_bytes, content_type='image/jpeg')
+            return web.Response(body=image_bytes, content_type='image/jpeg', headers=headers)
         except Exception as e:
             self.logger.error(f"Error getting camera image: {str(e)}", exc_info=True)
             return web.Response(text=f"Error loading camera image: {str(e)}", status=500)
 
     async def home(self, request: web.Request) -> web.Response:
-        """Render the home page with current system state."""
-        return render(request, self.current_state)
+        """Render the home page with current system state, reusing the last page while that state is unchanged."""
+        # Read the versions before rendering, a change made meanwhile bumps them and the next request re-renders
+        key = (self.current_state.page_version, self.current_state.config_version)
+        if self.home_page is not None and self.home_page[0] == key:
+            return web.Response(body=self.home_page[1], content_type='text/html', charset='utf-8')
+
+        response = render(request, self.current_state)
+        self.home_page = (key, response.body)
+        return response
 
     async def take_picture(self, request: web.Request) -> web.Response:
         """Endpoint to trigger taking a picture from a specific camera."""
@@ -500,20 +573,45 @@ class HydroControlApp:
             return web.Response(text="Camera not found", status=404)
             
         try:
-            async with aiohttp.ClientSession() as session:
-                camera_url = f"{self.current_state.camera_endpoints[camera_id]}/take/picture"
-                async with session.get(camera_url) as response:
-                    if response.status == 200:
-                        return web.Response(text="Picture taken successfully")
-                    return web.Response(text=f"Failed to take picture: {response.status}", status=500)
+            status = await self._request_picture(request.app['http_session'], self.current_state.camera_endpoints[camera_id])
+            if status == 200:
+                return web.Response(text="Picture taken successfully")
+            return web.Response(text=f"Failed to take picture: {status}", status=500)
         except Exception as e:
             self.logger.error(f"Error taking picture: {str(e)}", exc_info=True)
             return web.Response(text=f"Error taking picture: {str(e)}", status=500)
 
+    async def take_all_pictures(self, request: web.Request) -> web.Response:
+        """Endpoint to trigger taking a picture on every camera at once."""
+        session = request.app['http_session']
+        results = await asyncio.gather(
+            *(self._request_picture(session, endpoint) for endpoint in self.current_state.camera_endpoints),
+            return_exceptions=True
+        )
+
+        cameras = []
+        for camera_id, result in enumerate(results):
+            if result == 200:
+                cameras.append({'camera_id': camera_id, 'status': 'success'})
+            else:
+                message = (str(result) or type(result).__name__) if isinstance(result, BaseException) else f"Failed to take picture: {result}"
+                self.logger.error(f"Error taking picture on camera {camera_id}: {message}")
+                cameras.append({'camera_id': camera_id, 'status': 'error', 'message': message})
+
+        all_taken = all(camera['status'] == 'success' for camera in cameras)
+        return _json_response({
+            'status': 'success' if all_taken else 'error',
+            'cameras': cameras
+        }, status=200 if all_taken else 500)
+
+    async def _request_picture(self, session: aiohttp.ClientSession, endpoint: str) -> int:
+        """Ask a camera to take a picture and return the HTTP status it answered with."""
+        async with session.get(f"{endpoint}/take/picture") as response:
+            return response.status
+
     async def set_sensor_config(self, request: web.Request) -> web.Response:
         """Endpoint to configure sensor parameters."""
         try:
-            form = await request.post()
             form = await request.post()
             sensor_id = form.get('sensor_id')
             if not sensor_id:
@@ -523,10 +621,8 @@ class HydroControlApp:
                 stage = int(form.get('stage'))
                 min_moisture = float(form.get('min_moisture'))
                 # Get calibration values, providing defaults if missing or invalid
-                min_adc_str = form.get('min_adc', '0')
-                max_adc_str = form.get('max_adc', '4095')
-                min_adc = int(min_adc_str) if min_adc_str.isdigit() else 0
-                max_adc = int(max_adc_str) if max_adc_str.isdigit() else 4095
+                min_adc = self._parse_form_int(form, 'min_adc', 0)
+                max_adc = self._parse_form_int(form, 'max_adc', 4095)
 
                 if stage not in [1, 2, 3] or min_moisture < 0 or min_adc < 0 or max_adc <= min_adc:
                     raise ValueError("Invalid sensor configuration values.")
@@ -544,6 +640,7 @@ class HydroControlApp:
                 'max_adc': max_adc,
                 'active': existing_config.get('active', True) # Keep existing active state or default to True
             }
+            self.current_state.config_version += 1
             self.logger.info(f"Updated sensor config for {sensor_id}: {self.current_state.sensor_configs[sensor_id]}")
 
             # Return to main page
@@ -565,6 +662,7 @@ class HydroControlApp:
             # Toggle active state
             current_active = self.current_state.sensor_configs[sensor_id].get('active', True)
             self.current_state.sensor_configs[sensor_id]['active'] = not current_active
+            self.current_state.config_version += 1
             
             # Return to main page
             return render(request, self.current_state)
@@ -588,6 +686,11 @@ class HydroControlApp:
         except (ValueError, KeyError):
             return None
 
+    def _parse_form_int(self, form, key: str, default: int) -> int:
+        """Read a non-negative integer form field, falling back to default if missing or invalid."""
+        value = form.get(key)
+        return int(value) if value is not None and value.isdigit() else default
+
     async def _parse_brightness(self, request: web.Request) -> Optional[int]:
         """Extract and validate brightness value from request."""
         if not request.can_read_body:
@@ -601,75 +704,71 @@ class HydroControlApp:
             
     def _is_valid_time_format(self, time_str: str) -> bool:
         """Validate time string format (HH:MM in 24-hour format)."""
-        try:
-            # Check format
-            if len(time_str) != 5 or time_str[2] != ':':
-                return False
-                
-            # Parse hours and minutes
-            hours, minutes = map(int, time_str.split(':'))
-            
-            # Validate ranges
-            if hours < 0 or hours > 23 or minutes < 0 or minutes > 59:
-                return False
-                
-            return True
-        except (ValueError, IndexError):
-            return False
+        return TIME_FORMAT.fullmatch(time_str) is not None
 
     # --- Fan Control Handlers ---
 
+    # Validation error bodies don't depend on the request, encode them once
+    _FAN_TARGET_RANGE_ERROR = json.dumps(
+        {'status': 'error', 'message': 'Target humidity must be between 40 and 90'}).encode()
+    _FAN_TARGET_INVALID_ERROR = json.dumps(
+        {'status': 'error', 'message': 'Invalid target value provided. Expecting JSON: {"target": float}'}).encode()
+    _FAN_CONTROL_INVALID_ERROR = json.dumps(
+        {'status': 'error', 'message': 'Invalid active value provided. Expecting JSON: {"active": boolean}'}).encode()
+    _FAN_MANUAL_INVALID_ERROR = json.dumps(
+        {'status': 'error', 'message': 'Invalid manual value provided. Expecting JSON: {"on": boolean}'}).encode()
+
     async def get_fan_status(self, request: web.Request) -> web.Response:
         """Endpoint to get the current status of the fan."""
         if hasattr(self.current_state, 'fan_state'):
             # Ensure the state is up-to-date before returning
             if hasattr(self.current_state, 'fanctrl') and self.current_state.fanctrl:
                  self.current_state.fan_state = self.current_state.fanctrl.get_status()
-            return web.json_response({'status': 'success', 'fan_state': self.current_state.fan_state})
+            return _json_response({'status': 'success', 'fan_state': self.current_state.fan_state})
         else:
-            return web.json_response({'status': 'error', 'message': 'Fan state not available'}, status=500)
+            return _json_response({'status': 'error', 'message': 'Fan state not available'}, status=500)
 
     async def set_fan_target(self, request: web.Request) -> web.Response:
         """Endpoint to set the target humidity for the fan."""
         try:
-            data = await request.json()
+            data = await _read_json(request)
             target = float(data.get('target'))
             if not (40.0 <= target <= 90.0): # Validate range
-                 return web.json_response({'status': 'error', 'message': 'Target humidity must be between 40 and 90'}, status=400)
+                 return web.Response(body=self._FAN_TARGET_RANGE_ERROR, status=400, content_type='application/json')
 
-            self.current_state = self.controller.set_fan_target_humidity(self.current_state, target)
-            return web.json_response({'status': 'success', 'fan_state': self.current_state.fan_state})
+            self.controller.set_fan_target_humidity(self.current_state, target)
+            return _json_response({'status': 'success', 'fan_state': self.current_state.fan_state})
         except (ValueError, TypeError, KeyError):
-            return web.json_response({'status': 'error', 'message': 'Invalid target value provided. Expecting JSON: {"target": float}'}, status=400)
+            return web.Response(body=self._FAN_TARGET_INVALID_ERROR, status=400, content_type='application/json')
         except Exception as e:
             self.logger.error(f"Error setting fan target: {e}", exc_info=True)
-            return web.json_response({'status': 'error', 'message': f'Internal server error: {e}'}, status=500)
+            return _json_response({'status': 'error', 'message': f'Internal server error: {e}'}, status=500)
 
     async def set_fan_control(self, request: web.Request) -> web.Response:
         """Endpoint to activate or deactivate automatic fan control."""
         try:
-            data = await request.json()
+            data = await _read_json(request)
             active = bool(data.get('active')) # bool(None) is False, bool(True) is True
-            self.current_state = self.controller.set_fan_control_active(self.current_state, active)
-            return web.json_response({'status': 'success', 'fan_state': self.current_state.fan_state})
+            self.controller.set_fan_control_active(self.current_state, active)
+            return _json_response({'status': 'success', 'fan_state': self.current_state.fan_state})
         except (ValueError, TypeError, KeyError):
-             return web.json_response({'status': 'error', 'message': 'Invalid active value provided. Expecting JSON: {"active": boolean}'}, status=400)
+             return web.Response(body=self._FAN_CONTROL_INVALID_ERROR, status=400, content_type='application/json')
         except Exception as e:
             self.logger.error(f"Error setting fan control active state: {e}", exc_info=True)
-            return web.json_response({'status': 'error', 'message': f'Internal server error: {e}'}, status=500)
+            return _json_response({'status': 'error', 'message': f'Internal server error: {e}'}, status=500)
 
     async def set_fan_manual(self, request: web.Request) -> web.Response:
         """Endpoint to manually turn the fan on or off."""
         try:
-            data = await request.json()
+            data = await _read_json(request)
             turn_on = bool(data.get('on'))
-            self.current_state = self.controller.set_fan_manual(self.current_state, turn_on)
-            return web.json_response({'status': 'success', 'fan_state': self.current_state.fan_state})
+            self.controller.set_fan_manual(self.current_state, turn_on)
+            return _json_response({'status': 'success', 'fan_state': self.current_state.fan_state})
         except (ValueError, TypeError, KeyError):
-             return web.json_response({'status': 'error', 'message': 'Invalid manual value provided. Expecting JSON: {"on": boolean}'}, status=400)
+             return web.Response(body=self._FAN_MANUAL_INVALID_ERROR, status=400, content_type='application/json')
         except Exception as e:
             self.logger.error(f"Error setting fan manual state: {e}", exc_info=True)
-            return web.json_response({'status': 'error', 'message': f'Internal server error: {e}'}, status=500)
+            return _json_response({'status': 'error', 'message': f'Internal server error: {e}'}, status=500)
 
 
     # Application lifecycle methods
@@ -681,38 +780,70 @@ class HydroControlApp:
             self.logger.debug('Initializing database')
             await self.db.init_tables()
 
-            # Start background tasks
-            self.status_task = asyncio.create_task(self._log_status())
-            self.humidity_check_task = asyncio.create_task(self._periodic_humidity_check()) # Start humidity check task
-            # Start MQTT status task only if client initialized successfully
-            if self.mqtt_client:
-                self.mqtt_status_task = asyncio.create_task(self._periodic_mqtt_status())
+            # Sensor-triggered watering and the light auto mode timers run on this loop
+            loop = asyncio.get_running_loop()
+            self.current_state.wtrctrl.set_event_loop(loop)
+            for light in self.current_state.zeus.values():
+                light.set_event_loop(loop)
 
             # Start web server
-            runner = web.AppRunner(self.app)
+            # No access log: the dashboard polls constantly and errors are logged by the handlers
+            runner = web.AppRunner(self.app, access_log=None)
             await runner.setup()
+            self.runner = runner
             site = web.TCPSite(runner, '0.0.0.0', self.SERVER_PORT)
             await site.start()
             
             self.logger.info(f'Web server running at http://0.0.0.0:{self.SERVER_PORT}')
+
+            # Start background tasks (after runner.setup() so the shared HTTP session exists)
+            self.status_task = asyncio.create_task(self._log_status())
+            self.humidity_check_task = asyncio.create_task(self._periodic_humidity_check()) # Start humidity check task
+            # Start MQTT status task only if client initialized successfully
+            if self.mqtt_client:
+                self.mqtt_status_task = asyncio.create_task(self._periodic_mqtt_status())
             
-            # Keep application running
-            await asyncio.Event().wait()
+            # Keep application running until SIGINT/SIGTERM, then fall through to _shutdown
+            stop = asyncio.Event()
+
+            def request_stop(sig: signal.Signals) -> None:
+                self.logger.info(f"Received signal {sig.name}")
+                stop.set()
+
+            for sig in (signal.SIGINT, signal.SIGTERM):
+                try:
+                    loop.add_signal_handler(sig, request_stop, sig)
+                except NotImplementedError: # Windows event loops, Ctrl+C still raises KeyboardInterrupt
+                    pass
+            await stop.wait()
             
         except Exception as e:
             self.logger.error(f'Fatal error: {str(e)}', exc_info=True)
         finally:
             await self._shutdown()
 
+    @staticmethod
+    async def _sleep_until_next(deadline: float, interval: float) -> float:
+        """
+        Sleep until one interval after the previous deadline and return the new deadline.
+        Keeps periodic tasks on their schedule instead of adding each run's duration to the interval;
+        a run that overran its slot starts the next one right away rather than bursting to catch up.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = max(deadline + interval, loop.time())
+        await asyncio.sleep(deadline - loop.time())
+        return deadline
+
     async def _log_status(self) -> None:
         """Periodically log system status to the database."""
         STATUS_LOG_INTERVAL = self.config['LOGGING_INTERVAL']  # seconds (6.25 minutes)
+        next_log = asyncio.get_running_loop().time()
         
         while True:
             try:
                 # Log immediately then wait
-                await self.db.log_status(self.current_state)
-                await asyncio.sleep(STATUS_LOG_INTERVAL)
+                await self.db.log_status(self.current_state, self.app['http_session'])
+                next_log = await self._sleep_until_next(next_log, STATUS_LOG_INTERVAL)
             except asyncio.CancelledError:
                 self.logger.debug("Status logging task cancelled")
                 break
@@ -758,6 +889,10 @@ class HydroControlApp:
             self.mqtt_client.disconnect()
             self.logger.info("MQTT client disconnected.")
 
+        # Stop the web server (runs the app cleanup hooks, closing the HTTP session)
+        if self.runner:
+            await self.runner.cleanup()
+
         # Close database connection
         await self.db.close()
         self.logger.info('Shutdown complete')
@@ -766,12 +901,13 @@ class HydroControlApp:
         """Periodically check humidity and trigger fan control."""
         HUMIDITY_CHECK_INTERVAL = 10 # seconds (5 minutes)
         self.logger.info(f"Starting periodic humidity check every {HUMIDITY_CHECK_INTERVAL} seconds.")
+        next_check = asyncio.get_running_loop().time()
         while True:
             try:
                 # Wait first, then check
-                await asyncio.sleep(HUMIDITY_CHECK_INTERVAL)
+                next_check = await self._sleep_until_next(next_check, HUMIDITY_CHECK_INTERVAL)
                 self.logger.debug("Running periodic humidity check...")
-                self.current_state = self.controller.check_and_control_humidity(self.current_state)
+                self.controller.check_and_control_humidity(self.current_state)
             except asyncio.CancelledError:
                 self.logger.info("Periodic humidity check task cancelled.")
                 break
@@ -784,10 +920,11 @@ class HydroControlApp:
         """Periodically publish system status via MQTT."""
         MQTT_STATUS_INTERVAL = 300 # seconds (5 minutes)
         self.logger.info(f"Starting periodic MQTT status publishing every {MQTT_STATUS_INTERVAL} seconds.")
+        next_publish = asyncio.get_running_loop().time()
         while True:
             try:
                 # Wait first, then publish
-                await asyncio.sleep(MQTT_STATUS_INTERVAL)
+                next_publish = await self._sleep_until_next(next_publish, MQTT_STATUS_INTERVAL)
                 if self.mqtt_client: # Ensure client still exists
                     self.logger.debug("Publishing periodic MQTT status...")
                     self.mqtt_client.publish_status()
@@ -808,16 +945,10 @@ def main() -> None:
     """Application entry point."""
     app = HydroControlApp()
     
-    # Set up signal handlers
-    def handle_shutdown(signum, frame):
-        app.logger.info(f"Received signal {signal.Signals(signum).name}")
-        sys.exit(0)
-
-    signal.signal(signal.SIGINT, handle_shutdown)
-    signal.signal(signal.SIGTERM, handle_shutdown)
-    
     try:
-        asyncio.run(app.start())
+        # uvloop.run is the 3.12+ replacement for uvloop.install() + asyncio.run
+        run = uvloop.run if uvloop is not None else asyncio.run
+        run(app.start())
     except KeyboardInterrupt:
         app.logger.info('Received keyboard interrupt, shutting down...')
 
@@ -1,4 +1,6 @@
 import paho.mqtt.client as mqtt
+import itertools
+from collections import deque
 from datetime import datetime
 import json
 from typing import Dict, List
@@ -6,6 +8,8 @@ from typing import Dict, List
 # Import the calibration function
 from helper import calculate_moisture_percentage
 
+SENSOR_HISTORY_LENGTH = 24 # readings kept per sensor
+
 class MQTTClient:
     def __init__(self, state, config, client=None):
         """
@@ -17,6 +21,7 @@ class MQTTClient:
             client: Optional pre-configured MQTT client (for testing)
         """
         self.state = state
+        self._reading_seq = itertools.count(1) # increasing sequence number stamped on each reading
         self.client = client if client else mqtt.Client()
         self.client.on_connect = self.on_connect
         self.client.on_message = self.on_message
@@ -126,7 +131,8 @@ class MQTTClient:
             data: Dictionary containing sensor readings
         """
         if sensor_id not in self.state.sensor_readings:
-            self.state.sensor_readings[sensor_id] = []
+            # Bounded history, the oldest reading drops out on append
+            self.state.sensor_readings[sensor_id] = deque(maxlen=SENSOR_HISTORY_LENGTH)
             
         # Extract all relevant values
         timestamp = datetime.now().isoformat()
@@ -149,16 +155,19 @@ class MQTTClient:
             moisture_percent = calculate_moisture_percentage(raw_adc, 0, 4095) # Example: Calculate with defaults
 
 
-        self.state.sensor_readings[sensor_id].append({
+        reading = {
             'timestamp': timestamp,
             'raw_adc': raw_adc, # Store raw value
             'moisture_percent': moisture_percent, # Store calculated percentage
             'temperature': temperature,
-            'humidity': humidity # Store humidity here
-        })
-        
-        # Keep only last 24 readings (as per existing code)
-        self.state.sensor_readings[sensor_id] = self.state.sensor_readings[sensor_id][-24:]
+            'humidity': humidity, # Store humidity here
+            'seq': next(self._reading_seq) # Lets consumers tell new readings apart cheaply
+        }
+        self.state.sensor_readings[sensor_id].append(reading)
+        self.state.page_version += 1 # The home page shows the latest reading
+
+        # Let the watering controller evaluate this sensor's stage right away
+        self.state.wtrctrl.on_new_reading(sensor_id, reading)
         
         # Check watering triggers if this sensor is configured and we have a percentage
         if sensor_config and moisture_percent is not None:
@@ -186,7 +195,7 @@ class MQTTClient:
              return # Not enough data yet
 
         # Get last 4 moisture percentages (handle None if calculation failed previously)
-        last_four_percent = [r.get('moisture_percent') for r in readings[-4:]]
+        last_four_percent = [readings[i].get('moisture_percent') for i in range(-4, 0)]
 
         # Check if all last 4 readings are valid (not None) and below threshold
         if all(p is not None and p < min_moisture_threshold for p in last_four_percent):
@@ -1,5 +1,6 @@
+import asyncio
 from dataclasses import dataclass, field
-from typing import Dict, List 
+from typing import Deque, Dict, List, Optional
 
 from hydro import Hydro
 from lux import Lux
@@ -9,6 +10,21 @@ import itertools
 import json
 from datetime import datetime
 
+@dataclass(slots=True)
+class WateringState:
+    """Progress of a manual watering sequence, as reported by /water/status."""
+    status: str
+    progress_percent: int = 0
+    current_zone: Optional[str] = None
+    zones_completed: int = 0
+    total_zones: int = 0
+    started_at: Optional[str] = None
+    estimated_completion: Optional[str] = None
+    completed_at: Optional[str] = None
+    cancelled_at: Optional[str] = None
+    error_at: Optional[str] = None
+    error_message: Optional[str] = None
+
 @dataclass
 class SystemState:
     """
@@ -28,9 +44,11 @@ class SystemState:
     # Sensor state tracking
     # Updated sensor_configs structure: {sensor_id: {stage: int, min_moisture: float, active: bool, min_adc: int, max_adc: int}}
     sensor_configs: Dict[str, Dict] = field(default_factory=dict)
+    config_version: int = 0 # Bump after changing sensor_configs so cached lookups get rebuilt
+    page_version: int = 0 # Bump after changing other state rendered on the home page (lights, latest readings)
     humidity_readings: Dict[str, List[Dict]] = field(default_factory=dict) # {sensor_id: [{timestamp, humidity}]} # Add humidity readings storage
-    # Updated sensor_readings structure: {sensor_id: [{timestamp, raw_adc, moisture_percent, temp}]}
-    sensor_readings: Dict[str, List[Dict]] = field(default_factory=dict)
+    # Updated sensor_readings structure: {sensor_id: deque([{timestamp, raw_adc, moisture_percent, temp}])}, bounded by the MQTT client
+    sensor_readings: Dict[str, Deque[Dict]] = field(default_factory=dict)
     watering_triggers: Dict[int, bool] = field(default_factory=dict)  # {stage: should_water}
     
     # Initialize state tracking
@@ -42,11 +60,14 @@ class SystemState:
     static_light_auto_states: Dict[int, Dict] = field(init=False, default_factory=dict)
     zeus_auto_states: Dict[int, Dict] = field(init=False, default_factory=dict)
     valve_states: Dict[int, bool] = field(init=False, default_factory=dict)
+    watering_durations: Dict[int, int] = field(init=False, default_factory=dict)
     camera_endpoints: Dict = field(init=False)
 
     watering_progress: Dict = field(default_factory=dict) # Keep for potential manual/future use
-    watering_task: Dict = field(default_factory=dict)
+    watering_task: Optional[asyncio.Task] = None # Running manual watering sequence, None until one is started
+    watering_state: Optional[WateringState] = None # Progress of the last manual watering sequence, None until one is started
     fan_state: Dict = field(init=False, default_factory=dict) # Add fan state storage
+    _template_context: Dict = field(init=False, default=None, repr=False) # see template_context
 
     def __post_init__(self):
         """Initialize components after dataclass initialization"""
@@ -108,19 +129,19 @@ class SystemState:
             int(k): False for k in self.config['valve_pins'] # Keep default off state
         }
 
-        # Removed initialization for watering_auto_state and watering_durations
+        # Removed initialization for watering_auto_state
         # # Initialize watering auto state from config or defaults
         # initial_watering_auto = initial_state.get('watering', {}).get('auto_mode', {})
         # self.watering_auto_state = {
         #     "enabled": initial_watering_auto.get('enabled', False),
         #     "start_time": initial_watering_auto.get('start_time', None)
         # }
-        #
-        # # Initialize watering durations from config or defaults (default 180 seconds)
-        # initial_watering_durations = initial_state.get('watering', {}).get('durations', {})
-        # self.watering_durations = {
-        #     int(k): initial_watering_durations.get(str(k), 180) for k in self.config['valve_pins']
-        # }
+
+        # Initialize watering durations from config or defaults (default 180 seconds)
+        initial_watering_durations = initial_state.get('watering', {}).get('durations', {})
+        self.watering_durations = {
+            int(k): initial_watering_durations.get(str(k), 180) for k in self.config['valve_pins']
+        }
 
         # Initialize sensor configurations from config or defaults, ensuring calibration values are present
         initial_sensors = self.config.get('sensors', {}) # Get from main config directly
@@ -173,6 +194,25 @@ class SystemState:
 
         self.camera_endpoints = self.config['camera_endpoints']
 
+    def template_context(self) -> Dict:
+        """
+        Context for rendering index.html. Built once: the state dicts are mutated in place,
+        so the context sees their updates. Only fan_state is replaced at runtime and is refreshed here.
+        """
+        if self._template_context is None:
+            self._template_context = {
+                'lights': self.light_states,
+                'static_lights': self.static_light_states,
+                'static_light_auto_states': self.static_light_auto_states,
+                'zeus_auto_states': self.zeus_auto_states,
+                'watering_durations': self.watering_durations,
+                'sensor_configs': self.sensor_configs,
+                'sensor_readings': self.sensor_readings,
+                'camera_count': len(self.camera_endpoints),
+            }
+        self._template_context['fan_state'] = self.fan_state
+        return self._template_context
+
     def cleanup(self):
         try:
             # Cleanup Fan Control if initialized
@@ -247,7 +287,7 @@ class SystemState:
                 # "auto_mode": self.watering_auto_state,
                 # "durations": self.watering_durations,
                 "progress": self.watering_progress, # Keep for potential manual/future use
-                "active_task": bool(self.watering_task), # Keep for potential manual/future use
+                "active_task": self.watering_task is not None and not self.watering_task.done(), # Keep for potential manual/future use
                 # Optionally add new hydro internal states if needed for UI:
                 # "sensor_watering_active": dict(self.wtrctrl._watering_active),
                 # "sensor_watering_cooldown": dict(self.wtrctrl._waiting_for_readings),
@@ -26,29 +26,28 @@ class StaticLight(gpio_device):
         self._scheduler_running = False
         self._scheduler = scheduler if scheduler is not None else schedule
         
+        self._GPIO = None # RPi.GPIO module, bound once when running on hardware
         if not debug:
             import RPi.GPIO as GPIO
+            self._GPIO = GPIO
             
             # Setup GPIO
             GPIO.setmode(GPIO.BCM)
-            GPIO.setup(self._pin, GPIO.OUT)
-            GPIO.output(self._pin, GPIO.HIGH) # Start with LED off
+            GPIO.setup(self._pin, GPIO.OUT, initial=GPIO.HIGH) # Start with LED off
 
     def turn_on(self) -> None:
         """Turn LED on"""
         self._is_on = True
         self._logger.info(f"Turning on light with gpio : {self._pin}")
         if not self._debug:
-            import RPi.GPIO as GPIO
-            GPIO.output(self._pin, GPIO.LOW)
+            self._GPIO.output(self._pin, self._GPIO.LOW)
             
     def turn_off(self) -> None: 
         """Turn LED off"""
         self._is_on = False
         self._logger.info(f"Turning off light with gpio : {self._pin}")
         if not self._debug:
-            import RPi.GPIO as GPIO
-            GPIO.output(self._pin, GPIO.HIGH)
+            self._GPIO.output(self._pin, self._GPIO.HIGH)
 
     def is_on(self) -> bool:
         """Get LED state
@@ -79,8 +78,7 @@ class StaticLight(gpio_device):
         """Cleanup GPIO resources"""
         self.disable_auto_mode()  # Stop scheduler if running
         if not self._debug:
-            import RPi.GPIO as GPIO
-            GPIO.cleanup(self._pin)
+            self._GPIO.cleanup(self._pin)
 
     def set_auto_mode(self, start_time: str, duration_hours: int):
         """Set auto mode with start time and duration in hours
@@ -0,0 +1,242 @@
+import asyncio
+import sys
+import pytest
+from collections.abc import Mapping
+from unittest.mock import Mock, MagicMock, AsyncMock, patch
+from hydro import Hydro
+
+@pytest.fixture
+def mock_logger():
+    return Mock()
+
+@pytest.fixture
+def mock_state():
+    state = Mock()
+    state.valve_states = {}
+    state.pump_states = {1: False}
+    state.sensor_configs = {}
+    state.config_version = 0
+    state.sensor_readings = {}
+    return state
+
+@pytest.fixture
+def gpio_config():
+    return {
+        "pump_pin": 26,
+        "valve_pins": {"1": 20, "2": 19, "3": 12}
+    }
+
+@pytest.fixture
+def hydro(mock_logger, gpio_config, mock_state):
+    return Hydro(mock_logger, gpio_config, mock_state, debug=True)
+
+@pytest.fixture
+def mock_gpio():
+    gpio = MagicMock()
+    gpio.HIGH = 1
+    gpio.LOW = 0
+    with patch.dict(sys.modules, {'RPi': MagicMock(GPIO=gpio), 'RPi.GPIO': gpio}):
+        yield gpio
+
+def test_requires_state(mock_logger, gpio_config):
+    with pytest.raises(ValueError):
+        Hydro(mock_logger, gpio_config, None, debug=True)
+
+class TestCustomSchedule:
+    def test_schedule_is_unrolled_for_all_valves(self, hydro):
+        schedule = hydro.create_custom_schedule({1: 180, 2: 60, 3: 30})
+
+        assert schedule == [
+            {'pump': (1, True)}, 1,
+            {'valve_1': (1, True)}, 180,
+            {'valve_1': (1, False), 'valve_2': (2, True)}, 60,
+            {'valve_2': (2, False), 'valve_3': (3, True)}, 30,
+            {'valve_3': (3, False), 'pump': (1, False)},
+        ]
+
+    def test_missing_duration_defaults_to_zero(self, hydro):
+        schedule = hydro.create_custom_schedule({1: 10})
+
+        waits = [step for step in schedule if not isinstance(step, Mapping)]
+        assert waits == [1, 10, 0, 0]
+
+    def test_total_wait_matches_durations(self, hydro):
+        durations = {1: 5, 2: 6, 3: 7}
+        schedule = hydro.create_custom_schedule(durations)
+
+        assert sum(step for step in schedule if not isinstance(step, Mapping)) == 1 + sum(durations.values())
+
+    def test_control_steps_are_read_only(self, hydro):
+        schedule = hydro.create_custom_schedule({1: 10})
+
+        with pytest.raises(TypeError):
+            schedule[0]['pump'] = (1, False)
+        assert hydro.create_custom_schedule({1: 10})[0] == {'pump': (1, True)}
+
+class TestValveControl:
+    def test_set_all_valves_updates_every_valve_state(self, hydro, mock_state):
+        hydro.set_all_valves(True)
+        assert mock_state.valve_states == {1: True, 2: True, 3: True}
+
+        hydro.set_all_valves(False)
+        assert mock_state.valve_states == {1: False, 2: False, 3: False}
+
+    def test_apply_step_updates_state(self, hydro, mock_state):
+        hydro.apply_step({'valve_1': (1, False), 'valve_2': (2, True)})
+
+        assert mock_state.valve_states == {1: False, 2: True}
+
+    def test_apply_step_writes_all_pins_at_once(self, mock_logger, gpio_config, mock_state, mock_gpio):
+        hydro = Hydro(mock_logger, gpio_config, mock_state, debug=False)
+        mock_gpio.output.reset_mock()
+
+        hydro.apply_step({'valve_3': (3, False), 'pump': (1, False)})
+
+        mock_gpio.output.assert_called_once_with([12, 26], [1, 1])
+        assert mock_state.pump_states[1] is False
+
+    def test_pins_are_set_up_off_in_one_call(self, mock_logger, gpio_config, mock_state, mock_gpio):
+        Hydro(mock_logger, gpio_config, mock_state, debug=False)
+
+        mock_gpio.setup.assert_called_once_with([26, 20, 19, 12], mock_gpio.OUT, initial=1)
+
+    def test_close_all_valves_writes_valves_at_once(self, mock_logger, gpio_config, mock_state, mock_gpio):
+        hydro = Hydro(mock_logger, gpio_config, mock_state, debug=False)
+        mock_gpio.output.reset_mock()
+
+        hydro.close_all_valves()
+
+        mock_gpio.output.assert_any_call([20, 19, 12], 1)
+        assert mock_state.valve_states == {1: False, 2: False, 3: False}
+
+class TestSensorWatering:
+    @pytest.fixture
+    def configured_hydro(self, hydro, mock_state):
+        mock_state.sensor_configs = {
+            'sensor_a': {'stage': 2, 'min_moisture': 50.0, 'active': True},
+            'sensor_b': {'stage': 2, 'min_moisture': 40.0, 'active': True},
+            'sensor_c': {'stage': 3, 'min_moisture': 50.0, 'active': False},
+        }
+        return hydro
+
+    def test_stage_index_only_contains_active_sensors(self, configured_hydro):
+        assert configured_hydro._get_stage_index() == {2: ['sensor_a', 'sensor_b']}
+
+    def test_stage_index_rebuilt_on_config_version_change(self, configured_hydro, mock_state):
+        configured_hydro._get_stage_index()
+        mock_state.sensor_configs['sensor_c']['active'] = True
+        assert configured_hydro._get_stage_index() == {2: ['sensor_a', 'sensor_b']}
+
+        mock_state.config_version += 1
+        assert configured_hydro._get_stage_index() == {2: ['sensor_a', 'sensor_b'], 3: ['sensor_c']}
+
+    def test_stage_index_skips_invalid_stages(self, configured_hydro, mock_state):
+        mock_state.sensor_configs['sensor_d'] = {'stage': 7, 'min_moisture': 50.0, 'active': True}
+
+        assert 7 not in configured_hydro._get_stage_index()
+
+    def test_new_low_reading_triggers_stage_watering(self, configured_hydro, mock_state):
+        reading = {'timestamp': '2025-01-01T10:00:00', 'moisture_percent': 30.0}
+        mock_state.sensor_readings = {'sensor_a': [reading]}
+
+        with patch.object(configured_hydro, '_start_stage_watering') as mock_start:
+            configured_hydro.on_new_reading('sensor_a', reading)
+
+        mock_start.assert_called_once_with(2, 300)
+        assert configured_hydro._watering_active[2] is True
+
+    def test_cooldown_counts_each_new_reading_once(self, configured_hydro, mock_state):
+        configured_hydro._get_stage_index()
+        configured_hydro._waiting_for_readings[2] = True
+        mock_state.sensor_readings = {'sensor_a': []}
+
+        for seq in (1, 2, 2, 3):
+            reading = {'timestamp': '2025-01-01T10:00:00', 'moisture_percent': 60.0, 'seq': seq}
+            mock_state.sensor_readings['sensor_a'].append(reading)
+            configured_hydro.on_new_reading('sensor_a', reading)
+
+        assert configured_hydro._readings_since_watered[2] == 3
+        assert configured_hydro._waiting_for_readings[2] is True
+
+        reading = {'timestamp': '2025-01-01T10:05:00', 'moisture_percent': 60.0, 'seq': 4}
+        mock_state.sensor_readings['sensor_a'].append(reading)
+        configured_hydro.on_new_reading('sensor_a', reading)
+
+        assert configured_hydro._waiting_for_readings[2] is False
+
+    def test_trigger_without_loop_does_not_start_cooldown(self, configured_hydro, mock_state):
+        reading = {'timestamp': '2025-01-01T10:00:00', 'moisture_percent': 30.0, 'seq': 5}
+        mock_state.sensor_readings = {'sensor_a': [reading]}
+        configured_hydro._get_stage_index()
+        last_seq = list(configured_hydro._last_seq)
+
+        configured_hydro.on_new_reading('sensor_a', reading)
+
+        assert configured_hydro._watering_active[2] is False
+        assert configured_hydro._waiting_for_readings[2] is False
+        assert list(configured_hydro._last_seq) == last_seq
+        assert configured_hydro._watering_tasks == {}
+
+    def test_new_reading_from_inactive_sensor_is_ignored(self, configured_hydro, mock_state):
+        reading = {'timestamp': '2025-01-01T10:00:00', 'moisture_percent': 10.0}
+        mock_state.sensor_readings = {'sensor_c': [reading]}
+
+        with patch.object(configured_hydro, '_start_stage_watering') as mock_start:
+            configured_hydro.on_new_reading('sensor_c', reading)
+
+        mock_start.assert_not_called()
+
+    def test_stage_watering_runs_to_completion(self, hydro, mock_state):
+        async def scenario():
+            hydro._watering_active[1] = True
+            with patch('hydro.asyncio.sleep', new=AsyncMock()) as mock_sleep:
+                await hydro._execute_stage_watering(1, 300)
+            return mock_sleep
+
+        mock_sleep = asyncio.run(scenario())
+
+        assert [c.args[0] for c in mock_sleep.await_args_list] == [1, 300, 1]
+        assert mock_state.pump_states[1] is False
+        assert hydro._watering_active[1] is False
+
+    def test_pump_stays_on_while_another_stage_waters(self, hydro, mock_state):
+        async def scenario():
+            hydro._pump_refcount = 1 # another stage is using the pump
+            with patch('hydro.asyncio.sleep', new=AsyncMock()):
+                await hydro._execute_stage_watering(1, 300)
+
+        asyncio.run(scenario())
+
+        assert mock_state.pump_states[1] is True
+        assert hydro._pump_refcount == 1
+
+    def test_close_all_valves_cancels_stage_watering(self, hydro):
+        async def scenario():
+            hydro.set_event_loop(asyncio.get_running_loop())
+            hydro._watering_active[1] = True
+            hydro._start_stage_watering(1, 300)
+            task = hydro._watering_tasks[1]
+            await asyncio.sleep(0.01)
+
+            hydro.close_all_valves()
+            await asyncio.sleep(0.01)
+            return task
+
+        task = asyncio.run(scenario())
+
+        assert task.cancelled()
+        assert hydro._pump_refcount == 0
+        assert hydro._watering_tasks == {}
+        assert hydro._watering_active[1] is False
+
+    def test_lowest_sensor_threshold_decides(self, configured_hydro, mock_state):
+        # sensor_b is the driest but still above its own 40% threshold
+        mock_state.sensor_readings = {
+            'sensor_a': [{'timestamp': '2025-01-01T10:00:00', 'moisture_percent': 55.0}],
+            'sensor_b': [{'timestamp': '2025-01-01T10:00:00', 'moisture_percent': 45.0}],
+        }
+
+        with patch.object(configured_hydro, '_start_stage_watering') as mock_start:
+            configured_hydro.on_new_reading('sensor_b', mock_state.sensor_readings['sensor_b'][-1])
+
+        mock_start.assert_not_called()
@@ -63,28 +63,29 @@ class TestLux:
         return Mock()
 
     @pytest.fixture
-    def mock_scheduler(self):
-        return Mock(spec=schedule)
+    def mock_loop(self):
+        return Mock()
 
     @pytest.fixture
-    def lux(self, mock_logger, mock_scheduler):
-        light = Lux(mock_logger, pin=16, debug=True)
-        light._scheduler = mock_scheduler
-        return light
+    def lux(self, mock_logger, mock_loop):
+        return Lux(mock_logger, pin=16, debug=True, loop=mock_loop)
 
-    def test_set_auto_mode_schedules_jobs(self, lux, mock_scheduler):
+    def test_set_auto_mode_schedules_jobs(self, lux, mock_loop):
         with patch.object(lux, '_check_if_should_be_on'):
             lux.set_auto_mode("08:00", 12, 80)
             
-            # Should be called at least once for the main schedule
-            mock_scheduler.every.assert_called()
-            mock_scheduler.every().day.at.assert_any_call("08:00")
+            # Turn on timer is armed for the next 08:00
+            mock_loop.call_later.assert_called_once()
+            delay, callback = mock_loop.call_later.call_args.args
+            assert 0 < delay <= 24 * 3600
+            assert callback == lux.auto_turn_on
+            assert lux._next_turn_on.strftime("%H:%M") == "08:00"
         assert lux._auto_mode is True
         assert lux._start_time == "08:00"
         assert lux._duration_hours == 12
         assert lux._auto_brightness == 80
 
-    def test_auto_turn_on_sets_brightness(self, lux, mock_scheduler):
+    def test_auto_turn_on_sets_brightness(self, lux, mock_loop):
         lux._auto_mode = True
         lux._auto_brightness = 75
         lux._duration_hours = 5
@@ -94,9 +95,8 @@ class TestLux:
             mock_datetime.now.return_value = mock_now
             lux.auto_turn_on(current_time=mock_now)
             
-            # Verify turn off is scheduled for start_time + duration
-            expected_time = (mock_datetime.now() + timedelta(hours=5)).strftime("%H:%M")
-            mock_scheduler.every().day.at.assert_any_call(expected_time)
+            # Verify turn off is scheduled after the duration
+            mock_loop.call_later.assert_called_once_with(5 * 3600, lux.auto_turn_off)
             lux._logger.info.assert_called_with(
                 "Auto turning on light at 08:00 for 5 hours with brightness 75%"
             )
@@ -112,3 +112,51 @@ class TestLux:
         )
         assert lux._turn_off_job is None
         assert lux._current_level == 0
+
+    def test_auto_turn_on_rearms_next_day(self, lux, mock_loop):
+        lux._auto_mode = True
+        lux._duration_hours = 5
+        lux._next_turn_on = datetime(2025, 3, 25, 8, 0)
+
+        lux.auto_turn_on(current_time=datetime(2025, 3, 25, 8, 0))
+
+        mock_loop.call_later.assert_any_call(24 * 3600, lux.auto_turn_on)
+        assert lux._next_turn_on == datetime(2025, 3, 26, 8, 0)
+
+    def test_disable_auto_mode_cancels_timers(self, lux, mock_loop):
+        with patch.object(lux, '_check_if_should_be_on'):
+            lux.set_auto_mode("08:00", 12, 80)
+        turn_on_job = lux._turn_on_job
+
+        lux.disable_auto_mode()
+
+        turn_on_job.cancel.assert_called_once()
+        assert lux._turn_on_job is None
+
+    def test_timers_armed_when_loop_is_set(self, mock_logger, mock_loop):
+        lux = Lux(mock_logger, pin=16, debug=True)
+        with patch.object(lux, '_check_if_should_be_on'):
+            lux.set_auto_mode("08:00", 12, 80)
+            assert lux._turn_on_job is None
+
+            lux.set_event_loop(mock_loop)
+
+        mock_loop.call_later.assert_called_once()
+        assert lux._turn_on_job is mock_loop.call_later.return_value
+
+    def test_set_auto_mode_parses_start_time_once(self, lux):
+        with patch.object(lux, '_check_if_should_be_on'):
+            lux.set_auto_mode("06:30", 14, 80)
+
+        assert (lux._start_hour, lux._start_minute) == (6, 30)
+        assert lux._duration_delta == timedelta(hours=14)
+
+    def test_set_level_skips_unchanged_level(self, lux):
+        lux._debug = False
+        lux._pwm = Mock()
+
+        lux.set_level(40)
+        lux.set_level(40)
+        lux.set_level(150)
+
+        assert [c.args[0] for c in lux._pwm.ChangeDutyCycle.call_args_list] == [40, 100]
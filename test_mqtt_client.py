@@ -124,3 +124,23 @@ def test_check_watering_insufficient_readings(mock_state, config):
         client.check_watering_trigger(sensor_id)
         mock_print.assert_not_called()
         assert 1 not in mock_state.watering_triggers
+
+def test_sensor_history_is_bounded(mock_state, config):
+    client = MQTTClient(mock_state, config)
+    mock_state.sensor_configs['sensor1'] = {'stage': 1, 'min_moisture': 0.0, 'min_adc': 0, 'max_adc': 4095}
+
+    for adc in range(30):
+        client.process_sensor_data('sensor1', {'ADC': adc, 'Temperature': 21.0, 'Humidity': 50.0})
+
+    readings = mock_state.sensor_readings['sensor1']
+    assert len(readings) == 24
+    assert readings[-1]['raw_adc'] == 29
+    assert readings[0]['raw_adc'] == 6
+
+def test_new_reading_bumps_page_version(mock_state, config):
+    client = MQTTClient(mock_state, config)
+    mock_state.page_version = 0
+
+    client.process_sensor_data('sensor1', {'ADC': 100, 'Temperature': 21.0, 'Humidity': 50.0})
+
+    assert mock_state.page_version == 1